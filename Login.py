@@ -1,7 +1,14 @@
 import asyncio
+import sys
 from playwright.async_api import async_playwright
+from session_manager import SessionManager, wait_for_login
+
+# python Login.py            -> state.json
+# python Login.py account2   -> sessions/account2.json, registered as "account2" in sessions.json
+async def run(name=None):
+    sessions = SessionManager()
+    state_file = sessions.new_file(name) if name else "state.json"
 
-async def run():
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=False)
         context = await browser.new_context()
@@ -10,14 +17,20 @@ async def run():
         await page.goto("https://www.instagram.com/")
 
         print("⏳ Please log in to Instagram manually...")
-        print("✅ After login, close the browser window to continue.")
+        print("✅ The session is saved as soon as you are logged in, the window then closes by itself.")
 
-        # Wait for user to login and manually close the browser
-        await page.wait_for_timeout(120000)  # wait 2 mins max
-        await context.storage_state(path="state.json")
+        # Save the moment the session cookie appears instead of waiting out a fixed timer
+        if not await wait_for_login(context, timeout=300):
+            print("❌ No login within 5 minutes, nothing saved")
+            await browser.close()
+            return
+        # Let the post-login redirects set the remaining cookies
+        await page.wait_for_timeout(3000)
+        await context.storage_state(path=state_file)
+        sessions.register(name or state_file, state_file)
 
-        print("🎉 Login saved to state.json")
+        print(f"🎉 Login saved to {state_file}")
 
         await browser.close()
 
-asyncio.run(run())
+asyncio.run(run(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,243 @@
+"""Offline benchmark of the Instagram scraper against the local mock server.
+
+Runs scroll_to_load_posts, find_profile_efficiently, extract_profile_metrics
+and the whole scrape_instagram loop on synthetic pages from mock_instagram.py,
+so a change can be measured without touching live Instagram.
+
+    python benchmark.py --results 10 --output bench.json
+    python benchmark.py --results 10 --baseline bench.json
+
+Reports profiles per minute, page loads per profile, time spent in deliberate
+pauses and peak Chromium memory (needs psutil). With --baseline the numbers
+are compared to an earlier --output file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from playwright.async_api import async_playwright
+
+from browser_memory import chromium_memory, psutil
+from instagram_engine import (ScrapeConfig, extract_profile_metrics, find_profile_efficiently, scrape_instagram,
+                              scroll_to_load_posts)
+from json_extract import PayloadCollector, find_recent_media, find_user
+from mock_instagram import MockInstagram
+from network_policy import DEFAULT_BLOCK_POLICY, TrafficMeter
+from pacing import PacingController
+from scraper_pool import PagePool
+
+# Metrics where a higher value is better; everything else compared is lower-is-better
+HIGHER_IS_BETTER = {'profiles_per_minute'}
+
+
+class MemorySampler:
+    """Samples the summed RSS of the Chromium processes started by this process"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            mb = chromium_memory()['rss_mb']
+            if self.peak_mb is None or mb > self.peak_mb:
+                self.peak_mb = mb
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if psutil is None:
+            print("psutil is not installed, peak Chromium memory will not be measured")
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return round(self.peak_mb, 1) if self.peak_mb is not None else None
+
+
+def _timing(samples):
+    if not samples:
+        return {'calls': 0, 'total_s': 0, 'mean_s': 0}
+    return {'calls': len(samples), 'total_s': round(sum(samples), 3), 'mean_s': round(sum(samples) / len(samples), 3)}
+
+
+async def bench_components(mock, args):
+    """Time the hot functions one by one; navigation time is not included"""
+    timings = {'scroll_to_load_posts': [], 'find_profile_efficiently': [], 'extract_profile_metrics': []}
+    pacer = PacingController(base_delay=args.pacing_base_delay, min_delay=min(args.pacing_base_delay, 0.5))
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await mock.install(context)
+        meter = TrafficMeter(DEFAULT_BLOCK_POLICY)
+        await meter.install(context)
+        collector = PayloadCollector()
+        collector.install(context)
+        pool = PagePool(context, size=1, meter=meter, pacer=pacer, collector=collector)
+        page = (await pool.start())[0]
+
+        tag = args.hashtags[0]
+        await pool.goto(page, f"https://www.instagram.com/explore/tags/{tag}/", stage='hashtag')
+        start = time.monotonic()
+        links = await scroll_to_load_posts(page, args.scroll_posts, pacer)
+        timings['scroll_to_load_posts'].append(time.monotonic() - start)
+
+        owners = []
+        for link in links[:args.component_samples]:
+            await pool.goto(page, link, stage='post')
+            start = time.monotonic()
+            _, username = await find_profile_efficiently(page, link)
+            timings['find_profile_efficiently'].append(time.monotonic() - start)
+            if username and username not in owners:
+                owners.append(username)
+
+        for username in owners:
+            await pool.goto(page, f"https://www.instagram.com/{username}/", stage='profile')
+            payloads = await collector.payloads(page, username)
+            structured = find_user(payloads, username)
+            if structured:
+                structured['recent_media'] = find_recent_media(payloads, username)
+            start = time.monotonic()
+            await extract_profile_metrics(page, pool, structured, args.engagement_mode)
+            timings['extract_profile_metrics'].append(time.monotonic() - start)
+
+        await pool.close()
+        await browser.close()
+    return {name: _timing(samples) for name, samples in timings.items()}
+
+
+async def bench_full_run(mock, args, workdir):
+    """Run the whole scrape_instagram loop and derive throughput numbers from its summary"""
+    state_file = os.path.join(workdir, 'state.json')
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump({'cookies': [], 'origins': []}, f)
+    defaults = ScrapeConfig()
+    config = ScrapeConfig(
+        hashtags=args.hashtags,
+        results_per_tag=args.results,
+        min_engagement=args.min_engagement,
+        min_followers=args.min_followers,
+        output_file=os.path.join(workdir, 'user_profiles.csv'),
+        state_file=state_file,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        min_request_interval=0,
+        profile_cache_file=os.path.join(workdir, 'profile_cache.db'),
+        engagement_mode=args.engagement_mode,
+        selector_stats_file=os.path.join(workdir, 'selector_stats.json'),
+        checkpoint_file=os.path.join(workdir, 'crawl_checkpoint.json'),
+        seen_posts_file=os.path.join(workdir, 'seen_posts.bloom'),
+        watermark_file=os.path.join(workdir, 'tag_watermarks.json'),
+        result_store_file=os.path.join(workdir, 'user_profiles.db'),
+        archive_file=os.path.join(workdir, 'page_archive.db'),
+        metrics_json_file=os.path.join(workdir, 'run_metrics.json'),
+        metrics_prometheus_file=os.path.join(workdir, 'run_metrics.prom'),
+        pacing_base_delay=args.pacing_base_delay,
+        pacing_min_delay=min(args.pacing_base_delay, defaults.pacing_min_delay),
+        validate_session=False,
+        session_registry_file=os.path.join(workdir, 'sessions.json'),
+        context_setup=mock.install,
+    )
+    summary = {}
+    start = time.monotonic()
+    async for _ in scrape_instagram(config, on_done=summary.update):
+        pass
+    elapsed = time.monotonic() - start
+    added = summary.get('added', 0)
+    processed = summary.get('posts_processed', 0)
+    loads = summary.get('requests_used', 0)
+    return {
+        'elapsed_s': round(elapsed, 1),
+        'profiles_accepted': added,
+        'posts_processed': processed,
+        'page_loads': loads,
+        'profiles_per_minute': round(added / elapsed * 60, 2) if elapsed else 0,
+        'page_loads_per_post': round(loads / processed, 2) if processed else None,
+        'page_loads_per_accepted_profile': round(loads / added, 2) if added else None,
+        'paused_s': round(summary.get('paused_seconds', 0), 1),
+        'ready_wait_s': round(summary.get('ready_wait_seconds', 0), 1),
+        'filter_stages': summary.get('filter_stages'),
+    }
+
+
+def compare(results, baseline):
+    print("\n=== COMPARED TO BASELINE ===")
+    for key, value in results['full_run'].items():
+        old = baseline.get('full_run', {}).get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+            continue
+        change = (value - old) / old * 100
+        better = change > 0 if key in HIGHER_IS_BETTER else change < 0
+        marker = '' if abs(change) < 5 else (' (better)' if better else ' (worse)')
+        print(f"  {key}: {old} -> {value} ({change:+.1f}%){marker}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against a local mock Instagram")
+    parser.add_argument('--hashtags', nargs='+', default=['benchtravel'])
+    parser.add_argument('--results', type=int, default=10, help="profiles per hashtag in the full run")
+    parser.add_argument('--min-engagement', type=float, default=1)
+    parser.add_argument('--min-followers', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=ScrapeConfig.workers)
+    parser.add_argument('--max-concurrency', type=int, default=ScrapeConfig.max_concurrency)
+    parser.add_argument('--engagement-mode', choices=['grid', 'posts'], default=ScrapeConfig.engagement_mode)
+    parser.add_argument('--pacing-base-delay', type=float, default=ScrapeConfig.pacing_base_delay,
+                        help="lower it to benchmark the code rather than the deliberate pauses")
+    parser.add_argument('--posts-per-tag', type=int, default=120)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every mock page")
+    parser.add_argument('--no-json', action='store_true', help="leave embedded JSON out so the DOM fallbacks run")
+    parser.add_argument('--scroll-posts', type=int, default=36, help="links scroll_to_load_posts collects")
+    parser.add_argument('--component-samples', type=int, default=5, help="posts and profiles timed per function")
+    parser.add_argument('--skip-components', action='store_true')
+    parser.add_argument('--output', help="write the results as JSON")
+    parser.add_argument('--baseline', help="earlier --output file to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    mock = MockInstagram(posts_per_tag=args.posts_per_tag, latency=args.latency, with_json=not args.no_json)
+    mock.start()
+    sampler = MemorySampler()
+    sampler.start()
+    results = {'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}}
+    try:
+        if not args.skip_components:
+            results['components'] = asyncio.run(bench_components(mock, args))
+        with tempfile.TemporaryDirectory() as workdir:
+            results['full_run'] = asyncio.run(bench_full_run(mock, args, workdir))
+    finally:
+        results['peak_chromium_mb'] = sampler.stop()
+        results['mock_hits'] = dict(mock.hits)
+        mock.stop()
+
+    print("\n=== BENCHMARK ===")
+    for name, timing in results.get('components', {}).items():
+        print(f"  {name}: {timing['calls']} calls, {timing['mean_s']}s each")
+    for key, value in results['full_run'].items():
+        print(f"  {key}: {value}")
+    print(f"  peak_chromium_mb: {results['peak_chromium_mb']}")
+    print(f"  mock_hits: {results['mock_hits']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def chromium_memory():
+    """RSS of the Chromium processes started by this process, in MB, split out for the renderers.
+
+    Returns {'rss_mb', 'renderer_rss_mb', 'renderers'}, or None when psutil is not installed.
+    """
+    if psutil is None:
+        return None
+    total = 0
+    renderer = 0
+    renderers = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            name = child.name().lower()
+            if 'chrom' not in name and 'headless_shell' not in name:
+                continue
+            rss = child.memory_info().rss
+            total += rss
+            if '--type=renderer' in child.cmdline():
+                renderer += rss
+                renderers += 1
+        except psutil.Error:
+            continue
+    return {'rss_mb': round(total / 1024 / 1024, 1), 'renderer_rss_mb': round(renderer / 1024 / 1024, 1),
+            'renderers': renderers}
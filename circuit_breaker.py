@@ -0,0 +1,200 @@
+import asyncio
+import time
+
+from scraper_pool import BudgetExhausted
+
+# What a finished navigation looked like; only the BLOCKING ones count against the session.
+# server_error is a 5xx: Instagram having a bad moment, retried without pausing the other workers
+OUTCOMES = ['ok', 'empty', 'server_error', 'login_wall', 'challenge', 'rate_limited']
+BLOCKING_OUTCOMES = {'login_wall', 'challenge', 'rate_limited'}
+# Serious enough to open the breaker on the first occurrence
+TRIP_AT_ONCE = {'login_wall', 'challenge'}
+
+BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+# One round trip: the final URL is known, the rest is read from the rendered page
+CLASSIFY_JS = """
+() => {
+    const text = (document.body ? document.body.innerText : '').slice(0, 3000).toLowerCase();
+    return {
+        text,
+        loginForm: !!document.querySelector('input[name="username"]') && !!document.querySelector('input[name="password"]'),
+    };
+}
+"""
+
+CHALLENGE_URL_MARKERS = ['/challenge', '/accounts/suspended', '/accounts/disabled', '/checkpoint']
+CHALLENGE_TEXTS = ['suspicious login attempt', 'confirm it\'s you', 'we suspect automated behavior',
+                   'help us confirm', 'your account has been suspended']
+RATE_LIMIT_TEXTS = ['please wait a few minutes before you try again', 'try again later']
+EMPTY_TEXTS = ['sorry, this page isn\'t available', 'page not found']
+
+
+class NavigationBlocked(Exception):
+    """A navigation was not made because the run stopped while the breaker was open"""
+
+
+class SessionBlocked(BudgetExhausted):
+    """Instagram keeps refusing this session; the run stops like on an exhausted budget"""
+
+
+async def classify_navigation(page, response):
+    """Label a finished navigation with one of OUTCOMES"""
+    url = page.url
+    status = response.status if response else 0
+    if any(marker in url for marker in CHALLENGE_URL_MARKERS):
+        return 'challenge'
+    if '/accounts/login' in url:
+        return 'login_wall'
+    if status == 429:
+        return 'rate_limited'
+    try:
+        seen = await page.evaluate(CLASSIFY_JS)
+    except Exception:
+        return 'ok' if 200 <= status < 400 else 'empty'
+    text = seen['text']
+    # Block and error pages are short; on a real post these phrases could just be in a caption
+    short = len(text) < 1000
+    if short and any(marker in text for marker in CHALLENGE_TEXTS):
+        return 'challenge'
+    if short and any(marker in text for marker in RATE_LIMIT_TEXTS):
+        return 'rate_limited'
+    if seen['loginForm']:
+        return 'login_wall'
+    if status == 404 or (short and any(marker in text for marker in EMPTY_TEXTS)):
+        return 'empty'
+    if status >= 500:
+        return 'server_error'
+    return 'ok'
+
+
+class CircuitBreaker:
+    """Per-session circuit breaker over every navigation of a run.
+
+    closed: navigations flow. After failure_threshold blocking outcomes in a row
+    (or one challenge/login wall) it opens and every navigation waits, which
+    pauses the whole work queue rather than one request. After the cooldown it
+    goes half-open and lets exactly one probe through: an ok probe closes it, a
+    blocked probe reopens it with the cooldown doubled (up to max_cooldown).
+    After max_failed_probes failed probes in a row, or a login wall on a probe,
+    SessionBlocked ends the run. acquire() hands the probe a token that it passes
+    back to record(), so a load that was already under way when the circuit
+    opened can not stand in for the probe.
+    """
+
+    def __init__(self, failure_threshold=2, cooldown=60.0, max_cooldown=1800.0, max_failed_probes=4,
+                 metrics=None, on_change=None, should_stop=None):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_failed_probes = max_failed_probes
+        self.metrics = metrics
+        self.on_change = on_change
+        self.should_stop = should_stop
+        self.state = 'closed'
+        self.failures = 0
+        self.failed_probes = 0
+        self.opened_until = 0.0
+        # Token of the probe in flight, None when there is none
+        self.probe = None
+        self.probes = 0
+        # Set once the session is given up on; every later navigation is refused
+        self.blocked = None
+        self.blocked_outcome = None
+        self.trips = 0
+        self.open_seconds = 0.0
+        self.outcomes = {}
+
+    def _set_state(self, state, reason):
+        self.state = state
+        if self.metrics:
+            self.metrics.set_gauge('circuit_breaker_state', BREAKER_STATES[state])
+        if self.on_change:
+            self.on_change(state, reason, self.cooldown)
+
+    def _open(self, reason):
+        self.trips += 1
+        self.opened_until = time.monotonic() + self.cooldown
+        self.open_seconds += self.cooldown
+        if self.metrics:
+            self.metrics.inc('circuit_breaker_trips', reason=reason)
+        print(f"  ⛔ Circuit open after {reason}, pausing all navigation for {self.cooldown:.0f}s")
+        self._set_state('open', reason)
+
+    async def acquire(self):
+        """Wait until a navigation may go out; in half-open state only one caller (the probe) passes.
+
+        Returns the probe's token for that caller, None for everyone else.
+        """
+        while True:
+            if self.blocked:
+                raise NavigationBlocked(self.blocked)
+            if self.should_stop and self.should_stop():
+                raise NavigationBlocked("run stopped while navigation was paused")
+            if self.state == 'closed':
+                return None
+            if self.state == 'open':
+                wait = self.opened_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(min(wait, 1.0))
+                    continue
+                self.probe = None
+                self._set_state('half_open', 'cooldown over')
+            if self.probe is None:
+                self.probes += 1
+                self.probe = self.probes
+                print("  🔎 Circuit half-open, probing with one navigation")
+                return self.probe
+            await asyncio.sleep(0.5)
+
+    async def classify(self, page, response):
+        return await classify_navigation(page, response)
+
+    def record(self, outcome, token=None):
+        """Feed a navigation outcome in (or 'error' when it raised); True if the page is usable.
+
+        A server_error is not usable but, like 'error', neither trips nor closes the circuit.
+        token is what acquire() returned for this navigation.
+        """
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if self.metrics:
+            self.metrics.inc('navigation_outcomes', outcome=outcome)
+        probe = self.state == 'half_open' and token is not None and token == self.probe
+        if outcome not in BLOCKING_OUTCOMES:
+            if outcome in ('error', 'server_error'):
+                if probe:
+                    # Inconclusive, let the next navigation probe instead
+                    self.probe = None
+                return False
+            self.failures = 0
+            if probe:
+                self.failed_probes = 0
+                self.cooldown = self.base_cooldown
+                self.probe = None
+                print("  ✅ Probe went through, circuit closed")
+                self._set_state('closed', outcome)
+            return True
+
+        self.failures += 1
+        if probe:
+            self.probe = None
+            self.failed_probes += 1
+            if outcome == 'login_wall':
+                self.blocked = "Instagram logged this session out (login wall after cooling down)"
+            elif self.failed_probes >= self.max_failed_probes:
+                self.blocked = f"Instagram kept answering with {outcome} after {self.failed_probes} probes"
+            if self.blocked:
+                self.blocked_outcome = outcome
+                self._set_state('open', outcome)
+                raise SessionBlocked(self.blocked)
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self._open(outcome)
+        elif self.state == 'closed' and (outcome in TRIP_AT_ONCE or self.failures >= self.failure_threshold):
+            self._open(outcome)
+        return False
+
+    def report(self):
+        print("\n=== SESSION HEALTH ===")
+        print(f"  Navigations: {self.outcomes or 'none'}")
+        print(f"  Circuit breaker: {self.state}, opened {self.trips} times, paused {self.open_seconds:.0f}s in total")
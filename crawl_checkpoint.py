@@ -0,0 +1,62 @@
+import json
+import os
+
+
+class CrawlCheckpoint:
+    """Per-hashtag progress saved atomically so an interrupted run can resume"""
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.tags = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('signature') == signature:
+                    self.tags = saved.get('tags', {})
+                    print(f"Resuming from checkpoint with {len(self.tags)} hashtags in progress")
+                else:
+                    print("Checkpoint was written with different settings, starting fresh")
+            except Exception as e:
+                print(f"Error reading checkpoint: {e}")
+
+    def get(self, tag):
+        """Saved progress for tag: tried_posts, profiles_found, filtered, attempts, done"""
+        saved = self.tags.get(tag, {})
+        return {
+            'tried_posts': set(saved.get('tried_posts', [])),
+            'profiles_found': saved.get('profiles_found', 0),
+            'filtered': saved.get('filtered', 0),
+            'attempts': saved.get('attempts', 0),
+            'done': saved.get('done', False),
+        }
+
+    def update(self, tag, tried_posts, profiles_found, filtered, attempts, done=False, save=True):
+        """Record tag's progress; with save=False the caller writes several tags with one save()"""
+        self.tags[tag] = {
+            'tried_posts': sorted(tried_posts),
+            'profiles_found': profiles_found,
+            'filtered': filtered,
+            'attempts': attempts,
+            'done': done,
+        }
+        if save:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'signature': self.signature, 'tags': self.tags}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving checkpoint: {e}")
+
+    def clear(self):
+        """Remove the checkpoint once every hashtag has finished"""
+        self.tags = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
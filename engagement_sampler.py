@@ -0,0 +1,109 @@
+"""Sequential sampling of a profile's recent posts for the engagement filter.
+
+Each post gives one engagement ratio (likes + comments per follower, in %).
+Post engagement of one account varies by a roughly constant factor, so the
+bounds are taken on the log scale: estimate times/divided by
+exp(z * spread / sqrt(n)), where spread is the sample's log standard deviation
+shrunk toward PRIOR_LOG_SPREAD. Once the bounds are clear of the
+min/max_engagement range the answer is known and no more posts are opened.
+"""
+import math
+import statistics
+
+ESTIMATORS = ['mean', 'median', 'trimmed']
+
+# Typical log-spread of likes between posts of one account, used until the sample says otherwise
+PRIOR_LOG_SPREAD = 0.8
+PRIOR_WEIGHT = 2
+# Posts without a single like or comment still need a finite log
+RATIO_FLOOR = 0.001
+
+
+def trimmed_mean(values, trim=0.2):
+    """Mean without the top and bottom trim share; plain mean for under 5 values"""
+    values = sorted(values)
+    cut = int(len(values) * trim)
+    kept = values[cut:len(values) - cut] if cut else values
+    return sum(kept) / len(kept)
+
+
+def estimate_ratio(ratios, estimator='trimmed'):
+    if not ratios:
+        return 0
+    if estimator == 'median':
+        return statistics.median(ratios)
+    if estimator == 'trimmed':
+        return trimmed_mean(ratios)
+    return sum(ratios) / len(ratios)
+
+
+class EngagementSampler:
+    """Decides after each sampled post whether more posts are needed.
+
+    Non-sequential it samples exactly posts posts, as before. Sequential it stops
+    as soon as the bounds are clear of the filter range (after min_posts), and
+    goes on up to max_posts for borderline profiles still undecided at posts.
+    Without an engagement filter there is nothing to decide, so posts are sampled.
+    """
+
+    def __init__(self, followers, min_engagement=0, max_engagement=float('inf'), posts=3, min_posts=1,
+                 max_posts=6, estimator='trimmed', sequential=True, z=1.64):
+        self.followers = followers
+        self.min_engagement = min_engagement
+        self.max_engagement = max_engagement
+        self.posts = posts
+        self.min_posts = min_posts
+        self.max_posts = max(posts, max_posts) if sequential else posts
+        self.estimator = estimator
+        self.sequential = sequential
+        self.z = z
+        self.ratios = []
+
+    @property
+    def constrained(self):
+        return self.min_engagement > 0 or self.max_engagement != float('inf')
+
+    def add(self, likes, comments):
+        ratio = (likes + comments) / self.followers * 100 if self.followers > 0 else 0
+        self.ratios.append(ratio)
+
+    def estimate(self):
+        return round(estimate_ratio(self.ratios, self.estimator), 2)
+
+    def bounds(self):
+        """(low, high) engagement ratio the profile plausibly has, in %"""
+        n = len(self.ratios)
+        if not n:
+            return 0, float('inf')
+        if not self.followers:
+            return 0, 0
+        centre = max(estimate_ratio(self.ratios, self.estimator), RATIO_FLOOR)
+        logs = [math.log(max(r, RATIO_FLOOR)) for r in self.ratios]
+        mean_log = sum(logs) / n
+        squares = sum((x - mean_log) ** 2 for x in logs)
+        spread = math.sqrt((PRIOR_WEIGHT * PRIOR_LOG_SPREAD ** 2 + squares) / (PRIOR_WEIGHT + n - 1))
+        factor = math.exp(self.z * spread / math.sqrt(n))
+        return centre / factor, centre * factor
+
+    def decision(self):
+        """'accept' or 'reject' once the sample settles the filter, else None"""
+        if not self.constrained or len(self.ratios) < self.min_posts:
+            return None
+        low, high = self.bounds()
+        if high < self.min_engagement or low > self.max_engagement:
+            return 'reject'
+        if low >= self.min_engagement and high <= self.max_engagement:
+            return 'accept'
+        return None
+
+    def done(self):
+        n = len(self.ratios)
+        if n >= self.max_posts:
+            return True
+        if not self.sequential:
+            return False
+        decided = self.decision() is not None
+        if decided:
+            return True
+        # Borderline: keep sampling up to max_posts when the filter is still undecided
+        return n >= self.posts and not self.constrained
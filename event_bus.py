@@ -0,0 +1,88 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# kind is one of EVENT_KINDS; data is a dict whose keys depend on the kind
+Event = namedtuple('Event', ['kind', 'data', 'time'])
+
+EVENT_KINDS = [
+    'progress',          # percent
+    'status',            # text
+    'profile_accepted',  # row
+    'filtered',          # post_url
+    'stage_timing',      # post_url, seconds, status
+    'error',             # message, plus post_url or hashtag when known; fatal=True if the run stopped
+    'done',              # summary
+]
+
+
+class EventBus:
+    """Thread-safe queue of typed events from the scraping thread to a consumer.
+
+    The engine publishes from its event loop thread; the GUI drains the queue in
+    batches from its own thread (window.after), so Tk is only touched there.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def publish(self, kind, **data):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind: {kind}")
+        self.queue.put(Event(kind, data, time.time()))
+
+    def drain(self, max_events=500):
+        """Up to max_events pending events, oldest first, without blocking"""
+        events = []
+        while len(events) < max_events:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+class ScrapeCancelled(Exception):
+    """Raised inside the engine when the run was cancelled from outside"""
+
+
+class RunControl:
+    """Pause, resume and cancel flags shared between a UI thread and the engine.
+
+    The engine checks them cooperatively between posts: a pause holds every
+    worker before its next post, a cancel lets in-flight posts finish and then
+    ends the run with the usual save and export.
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        # A paused run has to wake up to notice the cancel
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    async def wait_if_paused(self, poll=0.2):
+        """Block while paused; raises ScrapeCancelled once cancelled"""
+        while self.paused and not self.cancelled:
+            await asyncio.sleep(poll)
+        if self.cancelled:
+            raise ScrapeCancelled("Run cancelled")
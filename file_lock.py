@@ -0,0 +1,43 @@
+"""Exclusive locks for files that several shard worker processes read, change and write back.
+
+The lock is taken on a sidecar <path>.lock file, so the data file itself can
+still be replaced atomically; writers use a tmp file of their own.
+"""
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold an exclusive lock for path across processes for the duration of the with block"""
+    with open(path + '.lock', 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK itself only retries for about 10 seconds
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def tmp_path(path):
+    """Temporary file next to path that no other process writes"""
+    return f"{path}.{os.getpid()}.tmp"
@@ -0,0 +1,85 @@
+"""Profile filters ordered by what they cost to evaluate.
+
+Followers come from the profile header, profession from the header text on the
+same page, engagement needs the recent posts (up to 3 extra page loads in
+'posts' mode). process_post runs the stages in this order and stops at the
+first rejection, so a profile outside the follower range never pays for its
+engagement.
+"""
+
+# Stage names in evaluation order, cheapest first
+STAGES = ['followers', 'profession', 'engagement']
+
+
+def check_followers(profile, filters):
+    followers = profile['followers']
+    if followers < filters['min_followers'] or followers > filters['max_followers']:
+        return f"{followers} followers not in range {filters['min_followers']}-{filters['max_followers']}"
+    return None
+
+
+def check_profession(profile, filters):
+    professions = filters['professions']
+    if not professions:
+        return None
+    profession = profile.get('profession') or ''
+    if not any(p in profession.lower() for p in professions):
+        return f"Profession '{profession}' not in {professions}"
+    return None
+
+
+def check_engagement(profile, filters):
+    ratio = profile['engagement_ratio']
+    if ratio < filters['min_engagement'] or ratio > filters['max_engagement']:
+        return f"{ratio}% not in range {filters['min_engagement']}%-{filters['max_engagement']}%"
+    return None
+
+
+CHECKS = {
+    'followers': check_followers,
+    'profession': check_profession,
+    'engagement': check_engagement,
+}
+
+
+class FilterStats:
+    """Per-stage rejection counts and the engagement page loads they avoided"""
+
+    def __init__(self):
+        self.rejected = {stage: 0 for stage in STAGES}
+        self.passed = 0
+        self.engagement_runs = 0
+        self.engagement_loads = 0
+
+    def check(self, stage, profile, filters):
+        """Run one stage; returns True if the profile may go on to the next one"""
+        reason = CHECKS[stage](profile, filters)
+        if reason:
+            self.rejected[stage] += 1
+            print(f"  ❌ Filtered out at {stage} stage: {reason}")
+            return False
+        return True
+
+    def record_engagement(self, loads):
+        self.engagement_runs += 1
+        self.engagement_loads += loads
+
+    def loads_saved(self):
+        """Estimated page loads skipped by rejecting before the engagement stage"""
+        early = self.rejected['followers'] + self.rejected['profession']
+        if not self.engagement_runs:
+            return 0
+        return round(early * self.engagement_loads / self.engagement_runs)
+
+    def summary(self):
+        return {'rejected': dict(self.rejected), 'passed': self.passed, 'loads_saved': self.loads_saved()}
+
+    def report(self):
+        print("\n=== FILTER STAGES ===")
+        for stage in STAGES:
+            print(f"  Rejected at {stage}: {self.rejected[stage]}")
+        print(f"  Passed all stages: {self.passed}")
+        if self.engagement_runs:
+            print(f"  Engagement stage: {self.engagement_runs} profiles, "
+                  f"{self.engagement_loads / self.engagement_runs:.1f} page loads each")
+        print(f"  Page loads saved by early rejection: ~{self.loads_saved()}")
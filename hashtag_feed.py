@@ -0,0 +1,187 @@
+import time
+
+from json_extract import shortcode_from_url
+from seen_posts import seen_key
+
+POST_LINK_SELECTORS = [
+    'a[href*="/p/"]',
+    'article a[href*="/p/"]',
+    '[role="link"][href*="/p/"]',
+    'div[style*="display"] a[href*="/p/"]'
+]
+
+POPUP_TEXTS = ['Not Now', 'Cancel', 'Not now', 'Close']
+
+# Counts post tiles added to the grid, so a scroll can wait on the DOM mutation itself
+TILE_OBSERVER_JS = """
+() => {
+    if (window.__tileObserver) return;
+    window.__tilesAdded = 0;
+    window.__tileObserver = new MutationObserver(mutations => {
+        for (const m of mutations) {
+            for (const node of m.addedNodes) {
+                if (node.nodeType !== 1) continue;
+                if ((node.matches && node.matches('a[href*="/p/"]')) || node.querySelector?.('a[href*="/p/"]')) {
+                    window.__tilesAdded++;
+                }
+            }
+        }
+    });
+    window.__tileObserver.observe(document.body, {childList: true, subtree: true});
+}
+"""
+
+
+class HashtagFeed:
+    """One hashtag grid kept open and read lazily.
+
+    The page is loaded once; links() yields post links the caller has not seen
+    yet and only scrolls when everything visible has been handed out. After a
+    scroll it waits for the MutationObserver to report new tiles instead of
+    sleeping. The grid is virtualized, so yielded links are remembered here.
+    Links in skip, or in seen_filter (posts processed under this tag in earlier
+    runs), are never handed out, so they cost no navigation.
+
+    With watermark (shortcodes already processed for this tag) the feed stops
+    once stop_after_known of them come in a row: everything below is older.
+    A single known post is not enough, the top posts section mixes in old ones.
+    handled() lists the shortcodes dealt with, in grid order, to raise the watermark.
+    After move_to() (the page was recycled) the grid is loaded again on the new page
+    and scrolled past what was already handed out.
+    """
+
+    def __init__(self, page, url, pool, skip=None, seen_filter=None, watermark=None, stop_after_known=12,
+                 max_scrolls=200, max_idle_scrolls=3, growth_timeout=5000, tag=None):
+        self.page = page
+        self.url = url
+        self.tag = tag
+        self.pool = pool
+        self.pacer = pool.pacer
+        self.skip = skip if skip is not None else set()
+        self.seen_filter = seen_filter
+        self.skipped_seen = 0
+        self.watermark = watermark
+        self.stop_after_known = stop_after_known
+        self.reached_watermark = False
+        self.passed = []
+        self.max_scrolls = max_scrolls
+        self.max_idle_scrolls = max_idle_scrolls
+        self.growth_timeout = growth_timeout
+        self.selector = POST_LINK_SELECTORS[0]
+        self.seen = set()
+        self.scrolls = 0
+        self.yielded = 0
+        self.moved = False
+
+    async def open(self):
+        await self.pool.goto(self.page, self.url, timeout=60000, stage='hashtag')
+        await self.pacer.settle(self.page)
+        await self.pacer.pause('navigation')
+        for popup_text in POPUP_TEXTS:
+            try:
+                await self.page.click(f'text="{popup_text}"', timeout=2000)
+                await self.pacer.pause('popup')
+            except:
+                pass
+        try:
+            await self.page.click('text="Show all posts"', timeout=3000)
+            await self.pacer.pause('popup')
+        except:
+            pass
+        for selector in POST_LINK_SELECTORS:
+            try:
+                await self.page.wait_for_selector(selector, timeout=10000)
+                self.selector = selector
+                print(f"Found posts using selector: {selector}")
+                break
+            except:
+                continue
+        else:
+            print("No post selectors found, will scroll and look for any links...")
+            self.pacer.record_trouble('empty_selector')
+        await self.page.evaluate(TILE_OBSERVER_JS)
+
+    async def _visible_links(self):
+        links = await self.page.eval_on_selector_all(self.selector, 'els => els.map(e => e.href)')
+        return [link for link in links if '/p/' in link and 'instagram.com' in link]
+
+    async def _scroll(self):
+        """Scroll once; True if new tiles were added to the grid"""
+        added = await self.page.evaluate('() => window.__tilesAdded || 0')
+        await self.page.evaluate('window.scrollBy(0, window.innerHeight)')
+        await self.page.mouse.wheel(0, 1000)
+        self.scrolls += 1
+        start = time.monotonic()
+        try:
+            await self.page.wait_for_function('n => (window.__tilesAdded || 0) > n', arg=added,
+                                              timeout=self.growth_timeout)
+            return True
+        except:
+            return False
+        finally:
+            waited = time.monotonic() - start
+            self.pacer.ready_wait_seconds += waited
+            if self.pool.metrics:
+                self.pool.metrics.observe('scroll_seconds', waited)
+
+    def move_to(self, page):
+        self.page = page
+        self.moved = True
+
+    def handled(self, done):
+        """Shortcodes in grid order that were skipped, or handed out and then finished (in done)"""
+        return [code for code, handed in self.passed if not handed or code in done]
+
+    async def links(self):
+        """Yield unseen post links, fetching more of the grid only when asked for them"""
+        idle = 0
+        known_run = 0
+        while True:
+            if self.moved:
+                self.moved = False
+                print(f"Reopening {self.url} on a fresh page")
+                await self.open()
+            fresh = []
+            try:
+                for link in await self._visible_links():
+                    if link in self.seen:
+                        continue
+                    self.seen.add(link)
+                    shortcode = shortcode_from_url(link)
+                    if self.watermark:
+                        known_run = known_run + 1 if shortcode in self.watermark else 0
+                        if known_run >= self.stop_after_known:
+                            self.reached_watermark = True
+                            break
+                        if known_run:
+                            self.passed.append((shortcode, False))
+                            continue
+                    if link in self.skip:
+                        self.passed.append((shortcode, False))
+                        continue
+                    if self.seen_filter is not None and seen_key(self.tag, shortcode) in self.seen_filter:
+                        self.skipped_seen += 1
+                        self.passed.append((shortcode, False))
+                        continue
+                    fresh.append(link)
+            except Exception as e:
+                print(f"Error reading grid links: {e}")
+            for link in fresh:
+                self.yielded += 1
+                self.passed.append((shortcode_from_url(link), True))
+                yield link
+            if self.reached_watermark:
+                print(f"Reached posts processed in an earlier run after {self.scrolls} scrolls")
+                return
+            if self.scrolls >= self.max_scrolls:
+                print(f"Stopped after {self.scrolls} scrolls")
+                return
+            if fresh:
+                idle = 0
+            elif idle >= self.max_idle_scrolls:
+                print(f"No new posts after {idle} scrolls, {self.yielded} posts handed out")
+                return
+            if not await self._scroll():
+                idle += 1
+                print("  No new tiles after scrolling")
+            await self.pacer.pause('scroll')
@@ -0,0 +1,237 @@
+"""Headless command line entry point for the Instagram scraper.
+
+Examples:
+    python instagram_cli.py scrape --hashtags-file tags.csv --results 30 --min-engagement 1 --output out.csv
+    python instagram_cli.py scrape --hashtags "#travel #food" --workers 2 --min-followers 10000
+    python instagram_cli.py scrape --hashtags-file tags.csv --refresh
+    python instagram_cli.py scrape --hashtags-file tags.csv --sessions state.json state2.json state3.json
+    python instagram_cli.py export --output user_profiles.csv
+    python instagram_cli.py refilter --min-engagement 2 --min-followers 5000 --output refiltered.csv
+    python instagram_cli.py sessions --check
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+
+from event_bus import RunControl
+from engagement_sampler import ESTIMATORS
+from instagram_engine import ScrapeConfig, export_results, get_hashtags_from_csv, get_hashtags_from_text, scrape_instagram
+from offline_filter import refilter, report, write_csv
+from page_archive import PageArchive
+from session_manager import SessionManager
+from shard_coordinator import run_sharded
+
+
+def build_parser():
+    defaults = ScrapeConfig()
+    parser = argparse.ArgumentParser(description="Instagram hashtag scraper with engagement filtering")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scrape = subparsers.add_parser('scrape', help="scrape hashtags and store accepted profiles")
+    source = scrape.add_mutually_exclusive_group(required=True)
+    source.add_argument('--hashtags-file', help="CSV/text file with one hashtag per line (first column)")
+    source.add_argument('--hashtags', help="text containing #hashtags")
+    scrape.add_argument('--results', type=int, default=defaults.results_per_tag, help="profiles per hashtag")
+    scrape.add_argument('--min-engagement', type=float, default=defaults.min_engagement)
+    scrape.add_argument('--max-engagement', type=float, default=defaults.max_engagement)
+    scrape.add_argument('--min-followers', type=int, default=defaults.min_followers)
+    scrape.add_argument('--max-followers', type=int, default=defaults.max_followers)
+    scrape.add_argument('--professions', default="", help="comma-separated profession/business filter")
+    scrape.add_argument('--output', default=defaults.output_file, help="CSV exported at the end of the run")
+    scrape.add_argument('--store', default=defaults.result_store_file, help="SQLite result store")
+    scrape.add_argument('--state-file', default=defaults.state_file, help="logged-in session file or name from Login.py")
+    scrape.add_argument('--workers', type=int, default=defaults.workers, help="pages processing posts in parallel")
+    scrape.add_argument('--max-concurrency', type=int, default=defaults.max_concurrency, help="navigations allowed at once")
+    scrape.add_argument('--request-budget', type=int, default=defaults.request_budget, help="navigations allowed per run")
+    scrape.add_argument('--schedule', choices=['yield', 'order'], default=defaults.tag_schedule,
+                        help="'yield' interleaves hashtags and favours the ones whose profiles pass the filters, "
+                             "'order' scrapes them one after another")
+    scrape.add_argument('--open-tags', type=int, default=defaults.open_tags, help="hashtags interleaved at once")
+    scrape.add_argument('--engagement-mode', choices=['grid', 'posts'], default=defaults.engagement_mode)
+    scrape.add_argument('--engagement-posts', type=int, default=defaults.engagement_posts,
+                        help="recent posts sampled per profile")
+    scrape.add_argument('--engagement-max-posts', type=int, default=defaults.engagement_max_posts,
+                        help="posts sampled for profiles close to the engagement limits")
+    scrape.add_argument('--estimator', choices=ESTIMATORS, default=defaults.engagement_estimator,
+                        help="how the engagement of the sampled posts is combined")
+    scrape.add_argument('--fixed-sample', action='store_true',
+                        help="always sample --engagement-posts posts instead of stopping once the filter is settled")
+    scrape.add_argument('--recycle-pages-after', type=int, default=defaults.page_recycle_after,
+                        help="navigations before a worker page is replaced with a fresh one (0: never)")
+    scrape.add_argument('--max-browser-memory', type=float, default=defaults.max_browser_rss_mb,
+                        help="MB of Chromium memory above which the browser context is rebuilt (needs psutil)")
+    scrape.add_argument('--show-browser', action='store_true', help="run Chromium with a window")
+    scrape.add_argument('--refresh', action='store_true',
+                        help="only look at posts newer than the ones processed in earlier runs of each hashtag")
+    scrape.add_argument('--revisit-seen', action='store_true', help="also open posts already processed in earlier runs")
+    scrape.add_argument('--archive-raw', action='store_true',
+                        help="also keep the raw HTML and JSON payloads of every page in the archive")
+    scrape.add_argument('--jsonl', help="also append each accepted profile as a JSON line to this file")
+    scrape.add_argument('--sessions', nargs='+',
+                        help="shard the hashtags across these session files or names, one process and browser each; "
+                             "'all' for every healthy registered session")
+    scrape.add_argument('--shard-dir', default="shards", help="per-session stores and checkpoints when sharding")
+
+    export = subparsers.add_parser('export', help="export the result store to CSV")
+    export.add_argument('--output', default=defaults.output_file)
+    export.add_argument('--store', default=defaults.result_store_file)
+
+    refilter = subparsers.add_parser('refilter', help="re-apply filters to the archived pages of earlier runs, offline")
+    refilter.add_argument('--archive', default=defaults.archive_file, help="page archive written by scrape runs")
+    refilter.add_argument('--hashtags', help="text containing #hashtags; all archived hashtags if omitted")
+    refilter.add_argument('--min-engagement', type=float, default=defaults.min_engagement)
+    refilter.add_argument('--max-engagement', type=float, default=defaults.max_engagement)
+    refilter.add_argument('--min-followers', type=int, default=defaults.min_followers)
+    refilter.add_argument('--max-followers', type=int, default=defaults.max_followers)
+    refilter.add_argument('--professions', default="", help="comma-separated profession/business filter")
+    refilter.add_argument('--estimator', choices=ESTIMATORS, default=defaults.engagement_estimator,
+                          help="how the engagement of the archived posts is combined")
+    refilter.add_argument('--output', default="refiltered_profiles.csv", help="CSV of the profiles that pass")
+
+    sessions = subparsers.add_parser('sessions', help="list saved login sessions and their health")
+    sessions.add_argument('--check', action='store_true', help="re-validate every session now instead of using cached results")
+    return parser
+
+
+def config_from_args(args):
+    if args.hashtags_file:
+        hashtags = get_hashtags_from_csv(args.hashtags_file)
+    else:
+        hashtags = get_hashtags_from_text(args.hashtags)
+    return ScrapeConfig(
+        hashtags=hashtags,
+        results_per_tag=args.results,
+        min_engagement=args.min_engagement,
+        max_engagement=args.max_engagement,
+        min_followers=args.min_followers,
+        max_followers=args.max_followers,
+        professions=[p.strip().lower() for p in args.professions.split(',') if p.strip()],
+        output_file=args.output,
+        result_store_file=args.store,
+        state_file=SessionManager(ScrapeConfig.session_registry_file).file_for(args.state_file),
+        headless=not args.show_browser,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        request_budget=args.request_budget,
+        engagement_mode=args.engagement_mode,
+        engagement_posts=args.engagement_posts,
+        engagement_max_posts=args.engagement_max_posts,
+        engagement_estimator=args.estimator,
+        engagement_sequential=not args.fixed_sample,
+        page_recycle_after=args.recycle_pages_after,
+        max_browser_rss_mb=args.max_browser_memory,
+        seen_posts_file=None if args.revisit_seen else ScrapeConfig.seen_posts_file,
+        archive_raw=args.archive_raw,
+        refresh=args.refresh,
+        tag_schedule=args.schedule,
+        open_tags=args.open_tags,
+    )
+
+
+async def run(config, jsonl_path=None, control=None):
+    summary = {}
+    jsonl = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+    try:
+        async for row in scrape_instagram(config, on_done=summary.update, control=control):
+            if jsonl:
+                jsonl.write(json.dumps(row, ensure_ascii=False) + '\n')
+                jsonl.flush()
+    finally:
+        if jsonl:
+            jsonl.close()
+    return summary
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'export':
+        exported_path, total = export_results(ScrapeConfig(output_file=args.output, result_store_file=args.store))
+        if not exported_path:
+            print(f"Could not write {args.output}", file=sys.stderr)
+            return 1
+        print(f"Exported {total} profiles to {exported_path}")
+        return 0
+    if args.command == 'refilter':
+        if not os.path.exists(args.archive):
+            print(f"No page archive at {args.archive}", file=sys.stderr)
+            return 2
+        filters = ScrapeConfig(
+            min_engagement=args.min_engagement,
+            max_engagement=args.max_engagement,
+            min_followers=args.min_followers,
+            max_followers=args.max_followers,
+            professions=[p.strip().lower() for p in args.professions.split(',') if p.strip()],
+        ).filters()
+        archive = PageArchive(args.archive)
+        try:
+            rows, counts = refilter(archive, filters, get_hashtags_from_text(args.hashtags) if args.hashtags else None,
+                                    dict(ScrapeConfig().engagement_sampling(), estimator=args.estimator))
+        finally:
+            archive.close()
+        report(counts)
+        write_csv(rows, args.output)
+        print(f"Wrote {len(rows)} profiles to {args.output}")
+        return 0
+    if args.command == 'sessions':
+        manager = SessionManager(ScrapeConfig.session_registry_file)
+        if not manager.sessions:
+            print("No sessions registered yet. Run Login.py <name> to add one.")
+            return 0
+        for name in list(manager.sessions):
+            manager.validate(name, force=args.check)
+        manager.report()
+        return 0
+
+    config = config_from_args(args)
+    if not config.hashtags:
+        print("No hashtags found in the input", file=sys.stderr)
+        return 2
+    session_files = args.sessions or [config.state_file]
+    if args.sessions:
+        # Expired or challenged sessions are left out rather than failing a whole worker later
+        manager = SessionManager(config.session_registry_file)
+        names = manager.usable(None if args.sessions == ['all'] else args.sessions)
+        skipped = [name for name in args.sessions if name not in names and name != 'all']
+        if skipped:
+            print(f"Skipping unusable sessions: {', '.join(skipped)}", file=sys.stderr)
+        if not names:
+            print("No usable login session. Run Login.py first.", file=sys.stderr)
+            return 2
+        session_files = [manager.file_for(name) for name in names]
+    missing = [path for path in session_files if not os.path.exists(path)]
+    if missing:
+        print(f"Login session file '{missing[0]}' not found. Run Login.py first.", file=sys.stderr)
+        return 2
+    if args.sessions:
+        jsonl = open(args.jsonl, 'a', encoding='utf-8') if args.jsonl else None
+
+        def on_row(row):
+            if jsonl:
+                jsonl.write(json.dumps(row, ensure_ascii=False) + '\n')
+                jsonl.flush()
+        try:
+            summary = run_sharded(config, session_files, shard_dir=args.shard_dir, on_row=on_row)
+        finally:
+            if jsonl:
+                jsonl.close()
+    else:
+        control = RunControl()
+
+        def interrupt(signum, frame):
+            # First Ctrl+C stops cleanly (store saved, CSV exported), the second aborts
+            if control.cancelled:
+                raise KeyboardInterrupt
+            print("\nCancelling after the posts in progress, press Ctrl+C again to abort", file=sys.stderr)
+            control.cancel()
+        signal.signal(signal.SIGINT, interrupt)
+        summary = asyncio.run(run(config, args.jsonl, control))
+    print(f"Profiles added: {summary.get('added', 0)}, filtered out: {summary.get('filtered', 0)}, "
+          f"CSV: {summary.get('exported_path') or 'not written'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1263 @@
+"""Instagram hashtag scraping engine.
+
+Importable without Tk or a display: build a ScrapeConfig and iterate
+scrape_instagram(config) to receive accepted profiles as they are found.
+The GUI in 'final instagram scraper.py' and the CLI in instagram_cli.py are
+thin consumers of this module.
+"""
+import asyncio
+import csv
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from playwright.async_api import async_playwright
+from circuit_breaker import BREAKER_STATES, CircuitBreaker, NavigationBlocked, SessionBlocked
+from crawl_checkpoint import CrawlCheckpoint
+from engagement_sampler import EngagementSampler, estimate_ratio
+from event_bus import RunControl, ScrapeCancelled
+from filter_pipeline import FilterStats
+from hashtag_feed import HashtagFeed
+from json_extract import PayloadCollector, find_post, find_recent_media, find_user, shortcode_from_url
+from network_policy import DEFAULT_BLOCK_POLICY, TrafficMeter
+from pacing import PacingController
+from page_archive import PageArchive
+from profile_cache import ProfileCache
+from profile_snapshot import (counts_from_snapshot, details_from_snapshot, parse_instagram_number, post_links_from_snapshot,
+                              take_profile_snapshot, username_from_snapshot)
+from result_store import ResultStore
+from run_metrics import RunMetrics
+from scraper_pool import BudgetExhausted, PagePool, RequestBudget, run_workers_from
+from seen_posts import SeenPostFilter, seen_key
+from selector_stats import SelectorStats
+from session_manager import SessionExpired, SessionManager
+from tag_scheduler import TagState, YieldScheduler
+from tag_watermarks import TagWatermarks
+
+
+@dataclass
+class ScrapeConfig:
+    """Settings for one scraping run; the defaults are what the GUI uses"""
+    hashtags: list = field(default_factory=list)
+    results_per_tag: int = 30
+    min_engagement: float = 0
+    max_engagement: float = float('inf')
+    min_followers: int = 0
+    max_followers: int = 10000000
+    professions: list = field(default_factory=list)
+
+    output_file: str = "user_profiles.csv"
+    state_file: str = "state.json"
+    headless: bool = True
+    # Check state_file with one light request before launching Chromium (cached for a few minutes);
+    # session health and last use are kept in the registry
+    validate_session: bool = True
+    session_registry_file: str = "sessions.json"
+
+    # Worker pool: pages sharing the state.json session, navigations allowed at once,
+    # navigations per run and minimum seconds between any two navigations
+    workers: int = 3
+    max_concurrency: int = 2
+    request_budget: int = 1500
+    min_request_interval: float = 1.0
+
+    # Profile metrics cache shared across hashtags and runs
+    profile_cache_file: str = "profile_cache.db"
+    profile_cache_ttl_hours: float = 72
+    profile_cache_max_entries: int = 50000
+
+    # 'grid' reads engagement off the profile page (2 page loads per profile),
+    # 'posts' opens the recent posts one by one
+    engagement_mode: str = "grid"
+    # Recent posts sampled per profile. With engagement_sequential the sampling stops as soon as the
+    # posts so far settle the min/max_engagement filter (after engagement_min_posts), and borderline
+    # profiles get up to engagement_max_posts; the ratio is the 'mean', 'median' or 'trimmed' mean of the posts
+    engagement_posts: int = 3
+    engagement_sequential: bool = True
+    engagement_min_posts: int = 1
+    engagement_max_posts: int = 6
+    engagement_estimator: str = "trimmed"
+
+    # Learned hit rates of the profile-link selectors, kept between runs
+    selector_stats_file: str = "selector_stats.json"
+
+    # Per-hashtag progress for resuming an interrupted run
+    checkpoint_file: str = "crawl_checkpoint.json"
+
+    # Every post processed in any run, per hashtag, skipped before navigation; None to revisit them
+    seen_posts_file: str = "seen_posts.bloom"
+    seen_posts_capacity: int = 500000
+
+    # Newest posts processed per hashtag, kept across runs. With refresh=True a hashtag is only
+    # scrolled until refresh_stop_after_known of them come in a row, so a daily re-run pays for new posts only
+    watermark_file: str = "tag_watermarks.json"
+    refresh: bool = False
+    refresh_stop_after_known: int = 12
+
+    # 'yield' interleaves up to open_tags hashtags and gives each next post to the tag with the best
+    # accepted profiles per second. A tag is cut once it has had tag_min_posts attempts and its acceptance rate
+    # is almost surely under tag_min_yield: around 190 posts if none passed, 280 if one did (see YieldScheduler);
+    # 'order' scrapes the hashtags one after another
+    tag_schedule: str = "yield"
+    open_tags: int = 3
+    tag_min_posts: int = 20
+    tag_min_yield: float = 0.02
+    max_attempts_per_tag: int = 1000
+
+    # Extracted data of every visited post and profile, accepted or not, so offline_filter can re-apply
+    # other thresholds without scraping again; archive_raw also keeps the HTML and JSON payloads.
+    # None to disable
+    archive_file: str = "page_archive.db"
+    archive_raw: bool = False
+
+    # Indexed store of all accepted profiles; the output CSV is exported from it. Accepted rows are committed
+    # every commit_every_rows rows or commit_interval seconds, and the checkpoint only records them after that
+    result_store_file: str = "user_profiles.db"
+    commit_every_rows: int = 5
+    commit_interval: float = 30
+    # Shard workers leave the CSV export to the coordinator that merges their rows
+    export_csv: bool = True
+    # Shard workers take their hashtags from the coordinator instead of hashtags: next_hashtag() returns the
+    # next one (None when there are no more) whenever a grid page is free, hashtag_done(tag, finished, added,
+    # filtered) reports each one closed. Both are set inside the worker process
+    next_hashtag: object = None
+    hashtag_done: object = None
+
+    # Drop images, media, fonts, stylesheets and analytics beacons; set to None to load everything
+    network_block_policy: dict = field(default_factory=lambda: DEFAULT_BLOCK_POLICY)
+
+    # Long runs: a worker page is replaced after page_recycle_after navigations, the whole browser context
+    # (login carried over) after context_recycle_after navigations or once Chromium uses more than
+    # max_browser_rss_mb (checked every memory_check_interval seconds, needs psutil). 0 or None to never recycle
+    page_recycle_after: int = 150
+    context_recycle_after: int = 1000
+    max_browser_rss_mb: float = 2500
+    memory_check_interval: float = 30
+
+    # Adaptive pacing: starting, floor and ceiling base delay in seconds
+    pacing_base_delay: float = 2.5
+    pacing_min_delay: float = 0.5
+    pacing_max_delay: float = 60.0
+
+    # Circuit breaker over all navigations of the session: opens after breaker_failure_threshold
+    # blocked loads in a row (at once on a challenge or login wall), pauses every worker for the
+    # cool-down, doubling it up to breaker_max_cooldown while probes keep failing, and ends the run
+    # after breaker_max_failed_probes failed probes
+    breaker_failure_threshold: int = 2
+    breaker_cooldown: float = 60.0
+    breaker_max_cooldown: float = 1800.0
+    breaker_max_failed_probes: int = 4
+
+    # Stage timings and counters, rewritten every metrics_export_interval seconds and at the end;
+    # set a path to None to skip that format
+    metrics_json_file: str = "run_metrics.json"
+    metrics_prometheus_file: str = "run_metrics.prom"
+    metrics_export_interval: float = 60
+
+    # Optional async callable(context) run right after the browser context is created,
+    # e.g. the benchmark routing instagram.com to its local mock server
+    context_setup: object = None
+
+    def engagement_sampling(self):
+        """Keyword arguments for EngagementSampler besides the follower count and the filter range"""
+        return {
+            'posts': self.engagement_posts,
+            'min_posts': self.engagement_min_posts,
+            'max_posts': self.engagement_max_posts,
+            'estimator': self.engagement_estimator,
+            'sequential': self.engagement_sequential,
+        }
+
+    def filters(self):
+        return {
+            'min_engagement': self.min_engagement,
+            'max_engagement': self.max_engagement,
+            'min_followers': self.min_followers,
+            'max_followers': self.max_followers,
+            'professions': self.professions
+        }
+
+
+def calculate_engagement_ratio(followers, avg_likes, avg_comments):
+    """Calculate engagement ratio as percentage"""
+    if followers == 0:
+        return 0
+    total_engagement = avg_likes + avg_comments
+    ratio = (total_engagement / followers) * 100
+    return round(ratio, 2)
+
+
+def engagement_sampler_for(profile, filters, sampling=None):
+    """EngagementSampler for the current filters, holding the posts the profile dict already has.
+    A sample that settled other thresholds may not be enough for these: done() tells."""
+    sampler = EngagementSampler(profile['followers'], filters['min_engagement'], filters['max_engagement'],
+                                **(sampling or {}))
+    comments = profile.get('recent_comments') or []
+    for i, likes in enumerate(profile.get('recent_likes') or []):
+        sampler.add(likes, comments[i] if i < len(comments) else 0)
+    return sampler
+
+
+def profile_engagement_ratio(profile, estimator='trimmed'):
+    """Engagement ratio of a profile dict: estimator over the ratios of its recent posts.
+    With 'mean' this is calculate_engagement_ratio of the average likes and comments."""
+    followers = profile['followers']
+    if followers > 0 and profile['recent_likes']:
+        comments = profile['recent_comments'] or []
+        ratios = [(likes + (comments[i] if i < len(comments) else 0)) / followers * 100
+                  for i, likes in enumerate(profile['recent_likes'])]
+        return round(estimate_ratio(ratios, estimator), 2)
+    return 0
+
+def get_hashtags_from_text(text):
+    # Find all hashtags in the text using regex
+    hashtag_pattern = r'#([a-zA-Z][a-zA-Z0-9_]*)'
+    hashtags = re.findall(hashtag_pattern, text)
+    
+    # Remove duplicates while preserving order
+    seen = set()
+    unique_hashtags = []
+    for tag in hashtags:
+        if tag.lower() not in seen:
+            seen.add(tag.lower())
+            unique_hashtags.append(tag)
+    
+    print(f"Found hashtags in text: {unique_hashtags}")
+    return unique_hashtags
+
+def get_hashtags_from_csv(file_path):
+    hashtags = []
+    with open(file_path, newline='') as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if row:
+                hashtags.append(row[0].strip().lstrip("#"))
+    return hashtags
+
+async def scroll_to_load_posts(page, count=30, pacer=None):
+    pacer = pacer or PacingController()
+    loaded = set()
+    tries = 0
+    
+    print("Waiting for page to load...")
+    
+    selectors_to_try = [
+        'a[href*="/p/"]',
+        'article a[href*="/p/"]',
+        '[role="link"][href*="/p/"]',
+        'div[style*="display"] a[href*="/p/"]'
+    ]
+    
+    found_selector = None
+    for selector in selectors_to_try:
+        try:
+            await page.wait_for_selector(selector, timeout=10000)
+            found_selector = selector
+            print(f"Found posts using selector: {selector}")
+            break
+        except:
+            continue
+    
+    if not found_selector:
+        print("No post selectors found, trying to scroll and look for any links...")
+        pacer.record_trouble('empty_selector')
+        await pacer.pause('navigation')
+        found_selector = 'a[href*="/p/"]'
+
+    print(f"Starting to collect posts with selector: {found_selector}")
+    
+    while len(loaded) < count and tries < 25:
+        try:
+            links = await page.eval_on_selector_all(found_selector, 'els => els.map(e => e.href)')
+            
+            for link in links:
+                if '/p/' in link and 'instagram.com' in link:
+                    loaded.add(link)
+            
+            print(f"Found {len(loaded)} unique posts so far (try {tries + 1})")
+            
+            if len(loaded) >= count:
+                break
+                
+            await page.evaluate('window.scrollBy(0, window.innerHeight)')
+            await page.mouse.wheel(0, 1000)
+            # Wait for new tiles rather than a fixed delay, then a short paced pause
+            if not await pacer.wait_for_growth(page, found_selector, len(links), links[-1] if links else None):
+                print("  No new tiles after scrolling")
+            await pacer.pause('scroll')
+            tries += 1
+            
+        except Exception as e:
+            print(f"Error in scroll attempt {tries}: {e}")
+            await pacer.pause('scroll')
+            tries += 1
+
+    final_posts = list(loaded)[:count]
+    print(f"Collected {len(final_posts)} post links")
+    return final_posts
+
+# Candidate strategies for the post owner, in hand-tuned priority order.
+# 'parent' strategies read the href of the matched element's parent.
+profile_strategies = [
+    {'name': 'span_link', 'selector': 'span a[href*="/"]'},
+    {'name': 'article_role_link', 'selector': 'article a[role="link"]'},
+    {'name': 'header_link', 'selector': 'header a[href*="/"]'},
+    {'name': 'article_header_link', 'selector': 'article header a'},
+    {'name': 'header_role_link', 'selector': 'header a[role="link"]'},
+    {'name': 'avatar_sibling', 'selector': '[data-testid="user_avatar"] + a'},
+    {'name': 'profile_picture_sibling', 'selector': 'img[alt*="profile picture"] + a'},
+    {'name': 'button_link', 'selector': 'div[role="button"] a'},
+    {'name': 'header_img_parent', 'selector': 'header img[alt]', 'parent': True},
+    {'name': 'profile_picture_parent', 'selector': 'img[alt*="profile picture"]', 'parent': True},
+]
+
+# Page source patterns, only tried once no selector has matched for a while
+profile_patterns = [
+    {'name': 'source_username', 'pattern': '"username":"([^"]+)"'},
+    {'name': 'source_owner', 'pattern': '"owner":{"username":"([^"]+)"'},
+    {'name': 'source_profile_url', 'pattern': 'instagram\\.com/([a-zA-Z0-9_.]+)/'},
+    {'name': 'source_shortcode_media', 'pattern': '"shortcode_media":{"owner":{"username":"([^"]+)"'},
+]
+
+excluded_usernames = ['explore', 'accounts', 'direct', 'stories', 'reels', 'tv']
+
+# Runs in the page and is polled by wait_for_function until something matches,
+# so every selector and pattern is tested without a Playwright round trip each
+PROFILE_RACE_JS = """
+([strategies, patterns, excluded, patternDelay, token]) => {
+    const started = window.__profileRace && window.__profileRace.token === token
+        ? window.__profileRace.started
+        : (window.__profileRace = {token, started: performance.now()}).started;
+    const usernameFrom = (href) => {
+        if (!href || !href.includes('/') || href.endsWith('#') || href.includes('/explore') || href.includes('/p/')) {
+            return null;
+        }
+        if (!href.startsWith('http')) {
+            href = 'https://www.instagram.com' + href;
+        }
+        const match = href.match(/instagram\\.com\\/([^\\/?#]+)/);
+        if (!match || excluded.includes(match[1])) {
+            return null;
+        }
+        return match[1];
+    };
+    const results = {};
+    for (const strategy of strategies) {
+        for (const el of document.querySelectorAll(strategy.selector)) {
+            const target = strategy.parent ? el.parentElement : el;
+            const username = target ? usernameFrom(target.getAttribute('href')) : null;
+            if (username) {
+                results[strategy.name] = username;
+                break;
+            }
+        }
+    }
+    if (Object.keys(results).length === 0 && performance.now() - started > patternDelay) {
+        const source = document.documentElement.outerHTML;
+        for (const pattern of patterns) {
+            const match = source.match(new RegExp(pattern.pattern));
+            if (match && match[1] && !excluded.includes(match[1])) {
+                results[pattern.name] = match[1];
+            }
+        }
+    }
+    return Object.keys(results).length ? results : null;
+}
+"""
+
+async def find_profile_efficiently(page, post_link, stats=None, timeout=10000, pattern_delay=3000):
+    """Race every profile selector and source pattern in one in-page evaluation.
+
+    Strategies are ordered by their learned hit rate, and the first one in that
+    order that produced a username wins. Returns (profile_url, username).
+    """
+    print("Finding profile link...")
+    strategies = stats.ordered(profile_strategies) if stats else profile_strategies
+    patterns = stats.ordered(profile_patterns) if stats else profile_patterns
+    try:
+        handle = await page.wait_for_function(
+            PROFILE_RACE_JS,
+            arg=[strategies, patterns, excluded_usernames, pattern_delay, post_link],
+            timeout=timeout,
+            polling=250
+        )
+        results = await handle.json_value()
+    except Exception as e:
+        print(f"  ✗ Selector race failed: {str(e)[:50]}...")
+        results = None
+
+    initial_username = None
+    winner = None
+    if results:
+        for strategy in strategies + patterns:
+            if strategy['name'] in results:
+                winner = strategy['name']
+                initial_username = results[winner]
+                break
+
+    if stats:
+        # A strategy scores a hit when it agrees with the winning username
+        patterns_tried = not results or any(p['name'] in results for p in patterns)
+        tried = strategies + patterns if patterns_tried else strategies
+        for strategy in tried:
+            stats.record(strategy['name'], bool(results) and results.get(strategy['name']) == initial_username)
+
+    if not initial_username:
+        print("  ✗ Could not find profile URL")
+        return None, None
+    profile_url = f"https://www.instagram.com/{initial_username}/"
+    print(f"  ✓ Found profile via {winner}: {initial_username} -> {profile_url}")
+    return profile_url, initial_username
+
+async def extract_profile_metrics(page, pool=None, structured=None, engagement_mode='grid', snapshot=None, sampler=None):
+    """Extract follower count and engagement metrics from profile.
+
+    structured holds header fields already parsed from JSON payloads; the DOM is
+    only read for what it does not cover. In 'grid' mode engagement comes from the
+    profile page itself and recent posts are only opened when that fails; 'posts'
+    mode always opens them. snapshot (take_profile_snapshot) is taken here when
+    not given, so the header is read in a single round trip.
+    """
+    snapshot = snapshot or await take_profile_snapshot(page)
+    metrics = await extract_header_counts(page, structured, snapshot)
+    engagement = await extract_recent_engagement(page, pool, structured, engagement_mode, snapshot, sampler)
+    metrics.update(engagement)
+    return metrics
+
+def header_counts_from(structured=None, snapshot=None):
+    """Posts, followers and following from the profile payload, else from the header snapshot.
+    Pure, so offline_filter re-derives archived profiles with the same rules."""
+    metrics = {
+        'followers': 0,
+        'following': 0,
+        'posts': 0
+    }
+    if structured and structured.get('followers') is not None:
+        # Exact counts from the profile payload, no DOM reads or "1.2M" rounding
+        metrics['followers'] = structured['followers']
+        metrics['following'] = structured.get('following') or 0
+        metrics['posts'] = structured.get('posts') or 0
+    else:
+        # Labelled header items, then positional spans, all from one snapshot of the header
+        metrics.update(counts_from_snapshot(snapshot))
+    return metrics
+
+async def extract_header_counts(page, structured=None, snapshot=None):
+    """Posts, followers and following from the profile header; no navigation"""
+    metrics = header_counts_from()
+    try:
+        if structured and structured.get('followers') is not None:
+            print("  Stats from JSON payload")
+        else:
+            snapshot = snapshot or await take_profile_snapshot(page)
+        metrics = header_counts_from(structured, snapshot)
+        print(f"  Stats: {metrics['posts']} posts, {metrics['followers']} followers, {metrics['following']} following")
+    except Exception as e:
+        print(f"  Error extracting profile metrics: {e}")
+    return metrics
+
+async def extract_recent_engagement(page, pool=None, structured=None, engagement_mode='grid', snapshot=None,
+                                    sampler=None, skip=0):
+    """Likes and comments of recent posts, the expensive part of a profile.
+
+    sampler (EngagementSampler) decides after each post whether another one is
+    needed; without one exactly 3 posts are sampled. skip is the number of newest
+    posts already in the sampler (from the cache), which are not read again.
+    Returns recent_likes, recent_comments and engagement_loads (post pages opened),
+    for the newly read posts only.
+    """
+    pacer = pool.pacer if pool and pool.pacer else PacingController()
+    sampler = sampler or EngagementSampler(0, sequential=False)
+    metrics = {
+        'recent_likes': [],
+        'recent_comments': [],
+        'engagement_loads': 0
+    }
+    try:
+        # Extract recent post engagement (likes and comments from first few posts)
+        print("  Extracting recent post engagement...")
+
+        if engagement_mode == 'grid':
+            # Read the counts off the profile itself; opening posts is the fallback
+            recent = payload_engagement(structured, limit=sampler.max_posts)
+            if recent:
+                print(f"  Engagement from profile payload ({len(recent)} posts)")
+            else:
+                recent = await extract_grid_engagement_hover(page, limit=sampler.max_posts)
+                if recent:
+                    print(f"  Engagement from grid hover overlays ({len(recent)} posts)")
+            if recent:
+                for i, (likes, comments) in enumerate(recent[skip:], start=skip):
+                    if sampler.done():
+                        break
+                    metrics['recent_likes'].append(likes)
+                    metrics['recent_comments'].append(comments)
+                    sampler.add(likes, comments)
+                    print(f"    Post {i+1}: {likes} likes, {comments} comments")
+                _record_sampling(pool, sampler)
+                return metrics
+        
+        # Find post links on profile
+        post_links = []
+        try:
+            # Taken before the first post load below navigates the page away
+            post_links = post_links_from_snapshot(snapshot or await take_profile_snapshot(page),
+                                                  limit=sampler.max_posts + 2)
+            
+            print(f"  Found {len(post_links)} recent posts to analyze")
+            
+            # Analyze engagement from recent posts, one at a time until the sampler has enough
+            for i, post_link in enumerate(post_links[skip:sampler.max_posts], start=skip):
+                if sampler.done():
+                    break
+                try:
+                    print(f"  Analyzing post {i+1}: {post_link}")
+                    if pool:
+                        await pool.goto(page, post_link, timeout=30000, stage='engagement')
+                    else:
+                        await page.goto(post_link, timeout=30000)
+                    metrics['engagement_loads'] += 1
+                    await pacer.settle(page, 'article section, main section')
+                    await pacer.pause('post')
+                    
+                    likes, comments = None, None
+                    if pool and pool.collector:
+                        shortcode = shortcode_from_url(post_link)
+                        post_info = find_post(await pool.collector.payloads(page, shortcode), shortcode)
+                        if post_info and post_info['likes'] is not None:
+                            likes, comments = post_info['likes'], post_info['comments'] or 0
+                    if likes is None:
+                        likes, comments = await extract_post_engagement_dom(page)
+                    
+                    if likes > 0 or comments > 0:
+                        metrics['recent_likes'].append(likes)
+                        metrics['recent_comments'].append(comments)
+                        sampler.add(likes, comments)
+                        print(f"    Post {i+1}: {likes} likes, {comments} comments")
+                    
+                except BudgetExhausted:
+                    raise
+                except Exception as e:
+                    print(f"    Error analyzing post {i+1}: {e}")
+                    continue
+                    
+        except BudgetExhausted:
+            raise
+        except Exception as e:
+            print(f"  Error extracting post engagement: {e}")
+        _record_sampling(pool, sampler)
+    
+    except BudgetExhausted:
+        raise
+    except Exception as e:
+        print(f"  Error extracting recent engagement: {e}")
+    
+    return metrics
+
+def _record_sampling(pool, sampler):
+    decision = sampler.decision()
+    if decision and len(sampler.ratios) < sampler.posts:
+        low, high = sampler.bounds()
+        print(f"  Engagement settled after {len(sampler.ratios)} posts ({decision}, likely {low:.2f}%-{high:.2f}%)")
+    if pool and pool.metrics:
+        pool.metrics.inc('engagement_decisions', decision=decision or 'full_sample')
+        pool.metrics.observe('engagement_posts_sampled', len(sampler.ratios))
+
+def payload_engagement(structured, limit=3):
+    """(likes, comments) of the newest posts listed in the profile payload"""
+    return ((structured or {}).get('recent_media') or [])[:limit]
+
+async def extract_grid_engagement_hover(page, limit=3):
+    """(likes, comments) of the first grid tiles, read from their hover overlays"""
+    recent = []
+    try:
+        tiles = await page.query_selector_all('main a[href*="/p/"], main a[href*="/reel/"]')
+        for tile in tiles[:limit]:
+            try:
+                await tile.hover(timeout=2000)
+                texts = await tile.eval_on_selector_all('li', 'els => els.map(e => e.textContent.trim())')
+                numbers = [parse_instagram_number(t) for t in texts if t and re.match(r'^[\d.,KkMm]+$', t)]
+                # Overlays show likes then comments; hidden like counts leave only comments
+                if len(numbers) >= 2:
+                    recent.append((numbers[0], numbers[1]))
+            except:
+                continue
+    except Exception as e:
+        print(f"  Grid hover read failed: {e}")
+    return recent
+
+async def extract_post_engagement_dom(page):
+    """Read like and comment counts of an open post from its rendered DOM"""
+    # Extract likes
+    likes = 0
+    like_selectors = [
+        'section span span',  # Common likes selector
+        '[data-testid="like_count"]',
+        'button span span',
+        'section button span'
+    ]
+
+    for like_sel in like_selectors:
+        try:
+            like_elements = await page.query_selector_all(like_sel)
+            for elem in like_elements:
+                text = await elem.text_content()
+                if text and ('like' in text.lower() or re.match(r'^\d+[.,]?\d*[KM]?$', text.strip())):
+                    # Extract number from likes text
+                    number_match = re.search(r'([\d,]+(?:\.\d+)?[KM]?)', text)
+                    if number_match:
+                        likes = parse_instagram_number(number_match.group(1))
+                        break
+            if likes > 0:
+                break
+        except:
+            continue
+
+    # Extract comments count
+    comments = 0
+    comment_selectors = [
+        'section button span',
+        '[data-testid="comment_count"]',
+        'section span'
+    ]
+
+    for comment_sel in comment_selectors:
+        try:
+            comment_elements = await page.query_selector_all(comment_sel)
+            for elem in comment_elements:
+                text = await elem.text_content()
+                if text and 'comment' in text.lower():
+                    number_match = re.search(r'([\d,]+(?:\.\d+)?[KM]?)', text)
+                    if number_match:
+                        comments = parse_instagram_number(number_match.group(1))
+                        break
+            if comments > 0:
+                break
+        except:
+            continue
+    return likes, comments
+
+def profile_details_from(structured=None, snapshot=None):
+    """Full name, bio and profession label from the profile payload, else from the header snapshot"""
+    if structured and structured.get('full_name') is not None and structured.get('bio') is not None:
+        return {'full_name': structured['full_name'], 'bio': structured['bio'], 'profession': structured.get('profession') or ''}
+    return details_from_snapshot(snapshot)
+
+async def extract_profile_details(page, structured=None, snapshot=None):
+    """Extract full name, bio and profession/business label from the profile header"""
+    if structured and structured.get('full_name') is not None and structured.get('bio') is not None:
+        details = profile_details_from(structured)
+        print(f"  Extracted profession/business from JSON payload: '{details['profession']}'")
+        return details
+    details = profile_details_from(None, snapshot or await take_profile_snapshot(page))
+    print(f"  Extracted profession/business: '{details['profession']}'")
+    return details
+
+async def process_post(page, pool, tag, post_link, filters, store, claimed, cache=None, stats=None,
+                       engagement_mode='grid', filter_stats=None, archive=None, engagement_sampling=None):
+    """Resolve the owner of one post, extract and filter their profile.
+
+    Filters run cheapest first (see filter_pipeline): follower counts and the
+    profession label are read from the profile header, and recent post
+    engagement is only fetched for profiles that passed both, and only as many
+    posts as it takes to settle the engagement filter (engagement_sampling holds
+    the EngagementSampler settings). With an archive
+    (PageArchive) the post, the profile header and the engagement are recorded
+    as they are read, whatever the filters decide.
+    Returns a (status, profile_data) tuple where status is 'accepted', 'filtered' or 'skipped'.
+    """
+    filter_stats = filter_stats or FilterStats()
+    metrics = pool.metrics or RunMetrics()
+    sampling = engagement_sampling or {}
+
+    await pool.goto(page, post_link, timeout=60000, stage='post')
+    await pool.pacer.settle(page, 'article, main')
+    await pool.pacer.pause('navigation')
+    profile_url, initial_username = None, None
+    post_info, post_payloads = None, None
+    with metrics.timer('step_seconds', step='profile_resolution'):
+        if pool.collector:
+            # The post payload already names the owner, no selector waits needed
+            shortcode = shortcode_from_url(post_link)
+            post_payloads = await pool.collector.payloads(page, shortcode)
+            post_info = find_post(post_payloads, shortcode)
+            if post_info and post_info['username'] and post_info['username'] not in excluded_usernames:
+                initial_username = post_info['username']
+                profile_url = f"https://www.instagram.com/{initial_username}/"
+                print(f"  ✓ Owner from JSON payload: {initial_username}")
+        if not profile_url:
+            profile_url, initial_username = await find_profile_efficiently(page, post_link, stats)
+    if archive:
+        archive.put('post', shortcode_from_url(post_link) or post_link,
+                    {'username': initial_username, 'profile_url': profile_url, 'post': post_info},
+                    raw={'payloads': post_payloads} if archive.keep_raw else None, hashtag=tag, url=post_link)
+    if not profile_url:
+        print("  ⚠️ Could not find profile URL, skipping")
+        return 'skipped', None
+
+    snapshot = None
+
+    async def open_profile():
+        """Load the profile page; returns the header fields found in its JSON payloads.
+        When those do not cover the whole header, the DOM is read once into snapshot."""
+        nonlocal snapshot
+        print(f"Going to profile: {profile_url}")
+        await pool.goto(page, profile_url, timeout=60000, stage='profile')
+        await pool.pacer.settle(page, 'header section')
+        await pool.pacer.pause('navigation')
+        found, payloads = None, None
+        if pool.collector and initial_username:
+            payloads = await pool.collector.payloads(page, initial_username)
+            found = find_user(payloads, initial_username)
+            if found:
+                found['recent_media'] = find_recent_media(payloads, initial_username)
+        snapshot = None
+        # The archive always gets a snapshot, so improved DOM parsers can be re-run on it later
+        if (archive or not found or found.get('followers') is None or found.get('full_name') is None
+                or found.get('bio') is None or not found.get('recent_media')):
+            with metrics.timer('step_seconds', step='header_snapshot'):
+                snapshot = await take_profile_snapshot(page)
+        if archive:
+            raw = None
+            if archive.keep_raw:
+                try:
+                    raw = {'html': await page.content(), 'payloads': payloads}
+                except Exception as e:
+                    print(f"  Could not read the page HTML: {e}")
+            archive.put('profile', initial_username or username_from_snapshot(snapshot),
+                        {'structured': found, 'snapshot': snapshot}, raw=raw, hashtag=tag, url=profile_url)
+        return found
+
+    profile = cache.get(initial_username) if cache and initial_username else None
+    cached = profile is not None
+    on_profile_page = not cached
+    structured = None
+    if profile:
+        # Cache hit: skip the profile load unless a later stage was never reached
+        final_username = initial_username
+        print(f"  Using cached metrics for {final_username}")
+        if archive:
+            # No page to snapshot, but refilter still needs the profile behind this post
+            archive.put('profile', final_username, {'cached': dict(profile)}, hashtag=tag, url=profile_url)
+    else:
+        structured = await open_profile()
+        final_username = initial_username if initial_username else ""
+        if structured:
+            print(f"  Profile payload found for {final_username}")
+        else:
+            page_username = username_from_snapshot(snapshot)
+            if page_username:
+                final_username = page_username
+                print(f"  Found username on page: {final_username}")
+        if not final_username and initial_username:
+            final_username = initial_username
+    if not final_username:
+        print("  ⚠️ No username found, skipping this profile")
+        return 'skipped', None
+    key = (tag, final_username)
+    if key in claimed or store.has(tag, final_username):
+        print(f"  Already have {final_username} for #{tag}, skipping...")
+        return 'skipped', None
+    # Claim the profile so another worker holding the same owner does not redo it
+    claimed.add(key)
+
+    # Stage 1: header counts, already on the page
+    if not cached:
+        with metrics.timer('step_seconds', step='header_counts'):
+            profile = await extract_header_counts(page, structured, snapshot)
+    if not filter_stats.check('followers', profile, filters):
+        if cache and not cached:
+            cache.put(final_username, profile)
+        return 'filtered', None
+
+    # Stage 2: name, bio and profession label from the same header.
+    # Profiles cached after an early rejection have neither these nor engagement yet.
+    if profile.get('full_name') is None:
+        if not on_profile_page:
+            structured = await open_profile()
+            on_profile_page = True
+        print(f"  Extracting details for {final_username}...")
+        with metrics.timer('step_seconds', step='profile_details'):
+            profile.update(await extract_profile_details(page, structured, snapshot))
+    if not filter_stats.check('profession', profile, filters):
+        if cache:
+            cache.put(final_username, profile)
+        return 'filtered', None
+
+    # Stage 3: recent post engagement, the only stage that may open more pages.
+    # A cached sample may have stopped early for other thresholds; it is topped up when it does not settle these.
+    # An empty one means no post could be read, which another try would not change
+    sampler = engagement_sampler_for(profile, filters, sampling)
+    if profile.get('recent_likes') is None or (profile['recent_likes'] and not sampler.done()):
+        if not on_profile_page:
+            structured = await open_profile()
+        known = len(sampler.ratios)
+        if known:
+            print(f"  Cached engagement of {known} posts does not settle the filter, sampling more for {final_username}...")
+        else:
+            print(f"  Extracting engagement for {final_username}...")
+        with metrics.timer('step_seconds', step='engagement'):
+            engagement = await extract_recent_engagement(page, pool, structured, engagement_mode, snapshot, sampler,
+                                                         skip=known)
+        loads = engagement.pop('engagement_loads')
+        filter_stats.record_engagement(loads)
+        profile['recent_likes'] = (profile.get('recent_likes') or []) + engagement['recent_likes']
+        profile['recent_comments'] = (profile.get('recent_comments') or []) + engagement['recent_comments']
+        if cache:
+            cache.put(final_username, profile)
+        if archive:
+            archive.put('engagement', final_username,
+                        {'recent_likes': profile['recent_likes'], 'recent_comments': profile['recent_comments'],
+                         'mode': engagement_mode, 'loads': loads}, hashtag=tag, url=profile_url)
+    engagement_ratio = profile_engagement_ratio(profile, sampling.get('estimator', 'trimmed'))
+    print(f"  Engagement ratio: {engagement_ratio}%")
+    profile['engagement_ratio'] = engagement_ratio
+    if not filter_stats.check('engagement', profile, filters):
+        return 'filtered', None
+    filter_stats.passed += 1
+    print(f"  ✅ Passed filters: {engagement_ratio}% engagement, {profile['followers']} followers")
+    profile_data = {
+        'hashtag': tag,
+        'username': final_username,
+        'full_name': profile['full_name'],
+        'bio': profile['bio'],
+        'profession': profile['profession'],
+        'followers': profile['followers'],
+        'following': profile['following'],
+        'posts': profile['posts'],
+        'engagement_ratio': engagement_ratio,
+        'profile_url': profile_url,
+        'post_url': post_link
+    }
+    return 'accepted', profile_data
+
+async def _crawl(config, emit, notify, publish, control):
+    """The scraping run behind scrape_instagram: emit(row) per accepted profile,
+    notify(kind, value) for progress, status and the final summary, publish(kind, **data)
+    for the other event bus events. control is checked between posts for pause/cancel."""
+    hashtags = config.hashtags
+    results_per_tag = config.results_per_tag
+    min_engagement = config.min_engagement
+    max_engagement = config.max_engagement
+    min_followers = config.min_followers
+    max_followers = config.max_followers
+    professions = config.professions
+    engagement_mode = config.engagement_mode
+    total_expected = max(1, len(hashtags) * results_per_tag)
+    current_count = 0
+    filtered_count = 0
+    posts_processed = 0
+    notify('progress', 0)
+    sessions = SessionManager(config.session_registry_file)
+    if config.validate_session:
+        notify('status', "Checking login session...")
+        health = await asyncio.get_event_loop().run_in_executor(None, sessions.validate, config.state_file)
+        if health in ('expired', 'flagged'):
+            reason = sessions.entry(config.state_file).get('reason', health)
+            raise SessionExpired(f"Login session {config.state_file} is not usable ({reason}). Run Login.py again.")
+    sessions.mark_used(config.state_file)
+    notify('status', "Launching browser...")
+    
+    data = []
+    
+    # Dedup against the indexed result store; CSV rows (and lock backups) not yet in it are folded in once
+    store = ResultStore(config.result_store_file, commit_every=config.commit_every_rows)
+    store.import_existing(config.output_file)
+    print(f"Result store holds {store.count()} existing entries")
+
+    filters = config.filters()
+    claimed = set()
+    budget_exhausted = False
+    cache = ProfileCache(config.profile_cache_file, ttl=config.profile_cache_ttl_hours * 3600,
+                         max_entries=config.profile_cache_max_entries)
+    stats = SelectorStats(config.selector_stats_file)
+    filter_stats = FilterStats()
+    metrics = RunMetrics()
+    seen_posts = SeenPostFilter(config.seen_posts_file, capacity=config.seen_posts_capacity) if config.seen_posts_file else None
+    watermarks = TagWatermarks(config.watermark_file) if config.watermark_file else None
+    archive = PageArchive(config.archive_file, keep_raw=config.archive_raw) if config.archive_file else None
+
+    signature = json.dumps([results_per_tag, min_engagement, max_engagement, min_followers, max_followers, sorted(professions)])
+    checkpoint = CrawlCheckpoint(config.checkpoint_file, signature)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=config.headless)
+        meter = TrafficMeter(config.network_block_policy)
+        collector = PayloadCollector()
+
+        async def new_context(storage_state):
+            # Also how the pool rebuilds the context when recycling it
+            context = await browser.new_context(storage_state=storage_state)
+            if config.context_setup:
+                await config.context_setup(context)
+            await meter.install(context)
+            collector.install(context)
+            return context
+        context = await new_context(config.state_file)
+        budget = RequestBudget(config.request_budget, min_interval=config.min_request_interval)
+        pacer = PacingController(base_delay=config.pacing_base_delay, min_delay=config.pacing_min_delay,
+                                 max_delay=config.pacing_max_delay, metrics=metrics)
+
+        def breaker_changed(state, reason, cooldown):
+            if state == 'open':
+                notify('status', f"⛔ Instagram answered with {reason.replace('_', ' ')}, all requests paused for {cooldown:.0f}s")
+            elif state == 'closed':
+                notify('status', f"{current_count} profiles scraped, {filtered_count} filtered out")
+        breaker = CircuitBreaker(failure_threshold=config.breaker_failure_threshold, cooldown=config.breaker_cooldown,
+                                 max_cooldown=config.breaker_max_cooldown, max_failed_probes=config.breaker_max_failed_probes,
+                                 metrics=metrics, on_change=breaker_changed, should_stop=lambda: control.cancelled)
+        pool = PagePool(context, size=config.workers, max_concurrency=config.max_concurrency, budget=budget, meter=meter, pacer=pacer,
+                        collector=collector, metrics=metrics, breaker=breaker, recycle_after=config.page_recycle_after,
+                        context_factory=new_context, context_recycle_after=config.context_recycle_after,
+                        max_rss_mb=config.max_browser_rss_mb, memory_check_interval=config.memory_check_interval)
+        pages = await pool.start(extra_headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        })
+
+        # Pick up where an interrupted run stopped
+        tag_states = [TagState(tag, checkpoint.get(tag)) for tag in hashtags]
+        for state in tag_states:
+            current_count += state.profiles_found
+            if state.status == 'finished':
+                print(f"#{state.tag} already finished in the interrupted run, skipping")
+
+        async def pull_tag():
+            nonlocal current_count
+            while True:
+                tag = await asyncio.get_event_loop().run_in_executor(None, config.next_hashtag)
+                if tag is None:
+                    return None
+                state = TagState(tag, checkpoint.get(tag))
+                current_count += state.profiles_found
+                if state.status == 'pending':
+                    return state
+                print(f"#{tag} already finished in the interrupted run, skipping")
+                config.hashtag_done(tag, True, state.profiles_found, state.filtered)
+
+        def collect_gauges(metrics):
+            metrics.set_gauge('requests_used', budget.used)
+            metrics.set_gauge('profiles_accepted', current_count)
+            metrics.set_gauge('profiles_filtered', filtered_count)
+            metrics.set_gauge('profile_cache_hits', cache.hits)
+            metrics.set_gauge('profile_cache_misses', cache.misses)
+            metrics.set_gauge('pacing_base_delay_seconds', round(pacer.delay, 3))
+            metrics.set_gauge('circuit_breaker_state', BREAKER_STATES[breaker.state])
+            metrics.set_gauge('circuit_breaker_cooldown_seconds', breaker.cooldown)
+            for state in tag_states:
+                if state.attempts:
+                    metrics.set_gauge('tag_acceptance_rate', round(state.acceptance_rate(), 3), tag=state.tag)
+            for stage, count in filter_stats.rejected.items():
+                metrics.set_gauge('filter_rejections', count, stage=stage)
+            for strategy in profile_strategies + profile_patterns:
+                if strategy['name'] in stats.stats:
+                    metrics.set_gauge('selector_hit_rate', round(stats.hit_rate(strategy['name']), 3), strategy=strategy['name'])
+        metrics.add_collector(collect_gauges)
+        exporter = None
+        if config.metrics_export_interval:
+            exporter = asyncio.ensure_future(metrics.export_every(
+                config.metrics_export_interval, config.metrics_json_file, config.metrics_prometheus_file))
+
+        async def handle_post(worker_page, item):
+            nonlocal current_count, filtered_count, posts_processed
+            state, post_link = item
+            tag = state.tag
+            try:
+                await control.wait_if_paused()
+            except ScrapeCancelled:
+                return
+            state.attempts += 1
+            posts_processed += 1
+            print(f"Processing post {state.attempts} of #{tag}: {post_link}")
+            started = time.monotonic()
+            try:
+                status, profile_data = await process_post(worker_page, pool, tag, post_link, filters, store, claimed,
+                                                         cache, stats, engagement_mode, filter_stats, archive,
+                                                         config.engagement_sampling())
+            except BudgetExhausted:
+                raise
+            except NavigationBlocked:
+                # Never opened, so neither tried nor seen: a later run picks it up
+                return
+            except Exception as e:
+                print(f"⚠️ Skipped a post: {e}")
+                metrics.inc('posts', status='error')
+                publish('error', message=str(e), post_url=post_link)
+                state.tried_posts.add(post_link)
+                state.record(time.monotonic() - started)
+                return
+            state.tried_posts.add(post_link)
+            state.record(time.monotonic() - started)
+            if seen_posts is not None:
+                seen_posts.add(seen_key(tag, shortcode_from_url(post_link)))
+            metrics.inc('posts', status=status)
+            publish('stage_timing', post_url=post_link, seconds=round(time.monotonic() - started, 2), status=status)
+            if status == 'filtered':
+                filtered_count += 1
+                state.filtered += 1
+                save_progress(state)
+                publish('filtered', post_url=post_link)
+                notify('status', f"{current_count} profiles scraped, {filtered_count} filtered out")
+                return
+            if status != 'accepted':
+                return
+            if state.profiles_found >= results_per_tag:
+                # Another worker filled the quota while this one was still extracting
+                print(f"  Quota for #{tag} already reached, dropping {profile_data['username']}")
+                return
+            # The checkpoint counts the row only once save_progress has seen it committed
+            with metrics.timer('store_write_seconds', op='add'):
+                store.add(profile_data)
+            data.append(profile_data)
+            emit(profile_data)
+            state.profiles_found += 1
+            save_progress(state)
+            current_count += 1
+            progress_percent = (current_count / total_expected) * 100
+            notify('progress', progress_percent)
+            notify('status', f"{current_count} profiles scraped, {filtered_count} filtered out")
+            print(f"✅ Successfully scraped: {profile_data['username']} (Engagement: {profile_data['engagement_ratio']}%, Followers: {profile_data['followers']})")
+            await pacer.pause('profile')
+
+        unsaved_progress = set()
+        last_commit = time.monotonic()
+
+        def save_progress(state, force=False):
+            # Accepted rows must be on disk before the checkpoint counts them and marks their posts tried,
+            # or a crash would lose them for good. So while the store holds uncommitted rows the checkpoint
+            # waits for its next batch commit (every commit_every_rows rows), the commit_interval or the tag closing
+            unsaved_progress.add(state)
+            if store.uncommitted and not force and time.monotonic() - last_commit < config.commit_interval:
+                return
+            flush_progress()
+
+        def flush_progress():
+            nonlocal last_commit
+            store.commit()
+            last_commit = time.monotonic()
+            for state in unsaved_progress:
+                checkpoint.update(state.tag, state.tried_posts, state.profiles_found, state.filtered, state.attempts,
+                                  done=state.done, save=False)
+            if unsaved_progress:
+                checkpoint.save()
+            unsaved_progress.clear()
+
+        def make_feed(state, page):
+            # The grid stays open while the tag is in rotation and is only scrolled when a worker needs a post
+            url = f"https://www.instagram.com/explore/tags/{state.tag}/"
+            print(f"\nScraping hashtag: #{state.tag}")
+            notify('status', f"Scraping #{state.tag}...")
+            if state.tried_posts:
+                print(f"Resuming #{state.tag}: {state.profiles_found} profiles found, {len(state.tried_posts)} posts already tried")
+            watermark = watermarks.known(state.tag) if config.refresh and watermarks else None
+            if watermark:
+                print(f"Refresh: stopping #{state.tag} at the {len(watermark)} newest posts of earlier runs")
+            return HashtagFeed(page, url, pool, skip=state.tried_posts, seen_filter=seen_posts, watermark=watermark,
+                               stop_after_known=config.refresh_stop_after_known, tag=state.tag)
+
+        def close_tag(state):
+            tag = state.tag
+            save_progress(state, force=True)
+            feed = state.feed
+            if feed:
+                print(f"Handed out {feed.yielded} posts for #{tag} after {feed.scrolls} scrolls, "
+                      f"{feed.skipped_seen} skipped as seen in earlier runs")
+                metrics.inc('posts_skipped_seen', feed.skipped_seen)
+                if watermarks:
+                    watermarks.update(tag, feed.handled({shortcode_from_url(link) for link in state.tried_posts}))
+            if state.status == 'cut':
+                print(f"✂️ Leaving #{tag}: only {state.profiles_found} of {state.attempts} posts passed the filters")
+                notify('status', f"✂️ #{tag} yields too few matching profiles, moving on")
+            elif feed and feed.reached_watermark:
+                print(f"No more new posts in #{tag}: {state.profiles_found} profiles from {feed.yielded} new posts")
+            elif state.profiles_found < results_per_tag:
+                print(f"⚠️ Only found {state.profiles_found} valid profiles for #{tag} after {state.attempts} attempts.")
+                notify('status', f"⚠️ Only found {state.profiles_found} valid profiles for #{tag} after {state.attempts} attempts.")
+            state.feed = None
+            if config.hashtag_done:
+                config.hashtag_done(tag, state.done, state.profiles_found, state.filtered)
+
+        scheduler = YieldScheduler(tag_states, results_per_tag, max_attempts=config.max_attempts_per_tag,
+                                   open_tags=config.open_tags, min_posts=config.tag_min_posts,
+                                   min_yield=config.tag_min_yield, adaptive=config.tag_schedule == 'yield',
+                                   more=pull_tag if config.next_hashtag else None)
+        # Grid pages rebuilt with the context reopen their hashtag on the new page
+        pool.on_page_replaced = scheduler.replace_page
+        # A page of its own per open hashtag grid, so workers never navigate them away
+        pending_tags = sum(1 for state in tag_states if state.status == 'pending')
+        if config.next_hashtag:
+            pending_tags = scheduler.open_tags
+        grid_pages = [await pool.open_extra_page() for _ in range(max(1, min(scheduler.open_tags, pending_tags)))]
+        try:
+            await run_workers_from(pages, scheduler.links(grid_pages, make_feed, close_tag), handle_post,
+                                   should_stop=lambda: control.cancelled or breaker.blocked, pool=pool)
+            if control.cancelled:
+                print("🛑 Run cancelled, saving what was scraped")
+                notify('status', "🛑 Cancelled, saving what was scraped")
+        except (SessionBlocked, NavigationBlocked) as e:
+            # NavigationBlocked comes from a grid that could not open because the session got blocked
+            # (another worker raised SessionBlocked first) or the run was cancelled
+            if breaker.blocked:
+                print(f"🛑 {breaker.blocked}, stopping the run")
+                notify('status', "🛑 Instagram is blocking this session, saving what was scraped")
+                publish('error', message=breaker.blocked)
+                sessions.mark_unhealthy(config.state_file, 'expired' if breaker.blocked_outcome == 'login_wall' else 'flagged',
+                                        breaker.blocked)
+                budget_exhausted = True
+            else:
+                print(f"🛑 Run cancelled ({e}), saving what was scraped")
+                notify('status', "🛑 Cancelled, saving what was scraped")
+        except BudgetExhausted as e:
+            print(f"🛑 {e}, stopping the run")
+            notify('status', "🛑 Session request budget used up, saving what was scraped")
+            budget_exhausted = True
+        except Exception as e:
+            print(f"❌ Scraping stopped: {e}")
+            publish('error', message=str(e))
+        # Tags still open when the run stopped are saved unfinished so the next run resumes them
+        for state in tag_states:
+            if state.status == 'active':
+                state.status = 'pending'
+                close_tag(state)
+        # Posts of tags closed while a worker was still on them
+        flush_progress()
+        scheduler.report()
+        if exporter:
+            exporter.cancel()
+        print(f"Used {budget.used} navigations of the session budget")
+        print(f"Profile cache: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+        if seen_posts is not None:
+            seen_posts.close()
+        if archive:
+            archived = archive.stats()
+            print(f"Page archive: {archived['visits']} visits, {archived['objects']} distinct records, "
+                  f"{archived['compressed_bytes'] / 1e6:.1f} MB in {config.archive_file}")
+            archive.close()
+        filter_stats.report()
+        metrics.report()
+        stats.save()
+        meter.report(profiles=current_count)
+        pacer.report(workers=pool.size)
+        breaker.report()
+        pool.report()
+        await pool.close()
+        await browser.close()
+
+        store.commit()
+        # tag_states also holds the hashtags a shard worker was handed during the run
+        finished_tags = [state.tag for state in tag_states if checkpoint.get(state.tag)['done']]
+        if len(finished_tags) == len(tag_states):
+            checkpoint.clear()
+
+        print(f"\nSaved {store.rows_added} profiles to {config.result_store_file} as they were scraped")
+        summary = {
+            'added': len(data),
+            'filtered': filtered_count,
+            'min_engagement': min_engagement,
+            'max_engagement': max_engagement,
+            'budget_exhausted': budget_exhausted,
+            'cancelled': control.cancelled,
+            'requests_used': budget.used,
+            'session_blocked': breaker.blocked,
+            'circuit_trips': breaker.trips,
+            'recycles': dict(pool.recycles),
+            'peak_browser_rss_mb': pool.peak_rss_mb,
+            'posts_processed': posts_processed,
+            'paused_seconds': pacer.paused_seconds,
+            'ready_wait_seconds': pacer.ready_wait_seconds,
+            'finished_tags': finished_tags,
+            'tag_yield': scheduler.summary(),
+            'filter_stages': filter_stats.summary(),
+            'output_file': config.output_file,
+            'result_store_file': config.result_store_file,
+            'exported_path': None,
+            'total_in_file': store.count(),
+        }
+        metrics.export(config.metrics_json_file, config.metrics_prometheus_file)
+        
+        if not config.export_csv:
+            store.close()
+            notify('status', f"✅ Done. {len(data)} profiles added, {filtered_count} filtered out.")
+            notify('done', summary)
+            return
+
+        if len(data) == 0:
+            store.close()
+            print("No new data to save")
+            notify('status', "✅ Done. No profiles passed the engagement filter.")
+            notify('done', summary)
+            return
+
+        # The CSV is now just an export of the store
+        with metrics.timer('store_write_seconds', op='export_csv'):
+            summary['exported_path'] = store.export_csv(config.output_file)
+        metrics.export(config.metrics_json_file, config.metrics_prometheus_file)
+        store.close()
+        if not summary['exported_path']:
+            print(f"Cannot write the CSV export, scraped data ({len(data)} profiles) is safe in {config.result_store_file}.")
+        elif summary['exported_path'] != config.output_file:
+            print(f"Data saved to backup file: {summary['exported_path']}")
+
+        # Update status
+        notify('status', f"✅ Done. {len(data)} profiles added, {filtered_count} filtered out.")
+        print(f"\n=== SCRAPING COMPLETE ===")
+        print(f"New profiles scraped: {len(data)}")
+        print(f"Profiles filtered out: {filtered_count}")
+        print(f"Total profiles in CSV: {summary['total_in_file']}")
+        notify('done', summary)
+
+async def scrape_instagram(config, on_progress=None, on_status=None, on_done=None, bus=None, control=None):
+    """Scrape config.hashtags and yield each accepted profile row as it is found.
+
+    on_progress(percent), on_status(text) and on_done(summary) are optional
+    callbacks; they run on the event loop's thread. A GUI on another thread
+    passes an EventBus instead and drains it itself. control (a RunControl)
+    lets another thread pause or cancel the run.
+    """
+    callbacks = {'progress': on_progress, 'status': on_status, 'done': on_done}
+    event_fields = {'progress': 'percent', 'status': 'text', 'done': 'summary'}
+    control = control or RunControl()
+    results = asyncio.Queue()
+
+    def publish(kind, **data):
+        if bus:
+            bus.publish(kind, **data)
+
+    def notify(kind, value):
+        if callbacks[kind]:
+            callbacks[kind](value)
+        publish(kind, **{event_fields[kind]: value})
+
+    def emit(row):
+        results.put_nowait(row)
+        publish('profile_accepted', row=row)
+
+    async def crawl():
+        try:
+            await _crawl(config, emit, notify, publish, control)
+        except Exception as e:
+            publish('error', message=str(e))
+            raise
+        finally:
+            results.put_nowait(None)
+
+    task = asyncio.ensure_future(crawl())
+    try:
+        while True:
+            row = await results.get()
+            if row is None:
+                break
+            yield row
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+
+def export_results(config):
+    """Write everything in the result store to the output CSV; returns (path or None, row count)"""
+    store = ResultStore(config.result_store_file)
+    store.import_existing(config.output_file)
+    exported_path = store.export_csv(config.output_file)
+    total = store.count()
+    store.close()
+    return exported_path, total
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import re
+
+# Responses worth parsing: the web API and GraphQL endpoints that carry profile and media data
+PAYLOAD_URL_MARKERS = ['/api/v1/', '/graphql']
+
+EMBEDDED_JSON_JS = """
+(needle) => Array.from(document.querySelectorAll('script[type="application/json"]'))
+    .map(s => s.textContent)
+    .filter(text => text && (!needle || text.includes(needle)))
+"""
+
+
+def shortcode_from_url(url):
+    match = re.search(r'/(?:p|reel)/([^/?#]+)', url or '')
+    return match.group(1) if match else None
+
+
+def parse_json_text(text):
+    """Parse a JSON body, tolerating the 'for (;;);' guard some endpoints prepend"""
+    if not text:
+        return None
+    text = text.strip()
+    if text.startswith('for (;;);'):
+        text = text[len('for (;;);'):]
+    try:
+        return json.loads(text)
+    except:
+        return None
+
+
+def iter_dicts(obj):
+    """Yield every dict nested anywhere inside obj, in document order"""
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(reversed(list(current.values())))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+
+def _count(data, *keys):
+    """First integer found under keys, unwrapping GraphQL {'count': n} edges"""
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, dict):
+            value = value.get('count')
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return int(value)
+    return None
+
+
+def find_user(payloads, username):
+    """Profile header fields for username from structured payloads, or None"""
+    if not username:
+        return None
+    username = username.lower()
+    for payload in payloads:
+        for data in iter_dicts(payload):
+            if str(data.get('username', '')).lower() != username:
+                continue
+            followers = _count(data, 'edge_followed_by', 'follower_count')
+            if followers is None:
+                continue
+            return {
+                'followers': followers,
+                'following': _count(data, 'edge_follow', 'following_count'),
+                'posts': _count(data, 'edge_owner_to_timeline_media', 'media_count'),
+                'full_name': data.get('full_name'),
+                'bio': data.get('biography'),
+                'profession': data.get('category_name') or data.get('business_category_name') or data.get('category'),
+            }
+    return None
+
+
+def find_post(payloads, shortcode):
+    """Owner username, like count and comment count of one post, or None"""
+    if not shortcode:
+        return None
+    for payload in payloads:
+        for data in iter_dicts(payload):
+            if shortcode not in (data.get('shortcode'), data.get('code')):
+                continue
+            owner = data.get('owner') or data.get('user') or {}
+            username = owner.get('username') if isinstance(owner, dict) else None
+            likes = _count(data, 'like_count', 'edge_media_preview_like', 'edge_liked_by')
+            comments = _count(data, 'comment_count', 'edge_media_to_parent_comment', 'edge_media_to_comment')
+            if username or likes is not None:
+                return {'username': username, 'likes': likes, 'comments': comments}
+    return None
+
+
+def find_recent_media(payloads, username, limit=12):
+    """(likes, comments) of the owner's most recent posts, from the profile or feed payload.
+
+    Covers the GraphQL timeline edges embedded in the profile and the v1 feed items,
+    so engagement can be estimated without opening any post.
+    """
+    if not username:
+        return []
+    username = username.lower()
+    seen = set()
+    recent = []
+
+    def add(media):
+        code = media.get('shortcode') or media.get('code') or media.get('id')
+        likes = _count(media, 'like_count', 'edge_liked_by', 'edge_media_preview_like')
+        if likes is None or code in seen:
+            return
+        seen.add(code)
+        comments = _count(media, 'comment_count', 'edge_media_to_comment', 'edge_media_to_parent_comment')
+        recent.append((likes, comments or 0))
+
+    for payload in payloads:
+        for data in iter_dicts(payload):
+            if str(data.get('username', '')).lower() == username:
+                timeline = data.get('edge_owner_to_timeline_media')
+                if isinstance(timeline, dict):
+                    for edge in timeline.get('edges') or []:
+                        if isinstance(edge, dict) and isinstance(edge.get('node'), dict):
+                            add(edge['node'])
+            elif 'like_count' in data:
+                owner = data.get('user') or data.get('owner') or {}
+                if isinstance(owner, dict) and str(owner.get('username', '')).lower() == username:
+                    add(data)
+            if len(recent) >= limit:
+                return recent
+    return recent
+
+
+class PayloadCollector:
+    """Keeps the JSON API responses each page received since its last navigation"""
+
+    def __init__(self):
+        self.page_payloads = {}
+        self.pending = 0
+
+    def install(self, context):
+        context.on("response", self._on_response)
+
+    def reset(self, page):
+        self.page_payloads[id(page)] = []
+
+    def forget(self, page):
+        self.page_payloads.pop(id(page), None)
+
+    async def _on_response(self, response):
+        if not any(marker in response.url for marker in PAYLOAD_URL_MARKERS):
+            return
+        self.pending += 1
+        try:
+            page_id = id(response.frame.page)
+            payload = parse_json_text(await response.text())
+            if payload is not None:
+                self.page_payloads.setdefault(page_id, []).append(payload)
+        except:
+            # Redirects and aborted requests have no body
+            pass
+        finally:
+            self.pending -= 1
+
+    async def payloads(self, page, needle=None, include_embedded=True, settle_timeout=2.0):
+        """Intercepted payloads for page plus the JSON embedded in its script tags"""
+        waited = 0.0
+        while self.pending and waited < settle_timeout:
+            await asyncio.sleep(0.05)
+            waited += 0.05
+        collected = list(self.page_payloads.get(id(page), []))
+        if include_embedded:
+            try:
+                for text in await page.evaluate(EMBEDDED_JSON_JS, needle):
+                    payload = parse_json_text(text)
+                    if payload is not None:
+                        collected.append(payload)
+            except Exception as e:
+                print(f"  Embedded JSON read failed: {str(e)[:50]}")
+        return collected
@@ -0,0 +1,215 @@
+"""Local stand-in for the Instagram pages the scraper reads, for offline benchmarks.
+
+MockInstagram serves synthetic hashtag grids, posts and profiles from a local
+HTTP server. Every page is derived from its name with a fixed seed, so two runs
+see exactly the same data. install(context) routes www.instagram.com requests
+of a Playwright context to the server, so the scraper runs unchanged.
+"""
+import html
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CATEGORIES = ['Chef', 'Photographer', 'Travel blogger', 'Artist', 'Fitness trainer', 'Restaurant', '']
+
+
+def _rng(*parts):
+    return random.Random(zlib.crc32('/'.join(str(p) for p in parts).encode()))
+
+
+class MockInstagram:
+    """Synthetic hashtag, post and profile pages served on 127.0.0.1.
+
+    posts_per_tag tiles per hashtag grid, revealed tiles_per_scroll at a time,
+    owned by a pool of owners_per_tag accounts (so some owners repeat).
+    latency is added to every page response; with_json=False leaves out the
+    embedded JSON so the DOM fallbacks are exercised instead.
+    """
+
+    def __init__(self, posts_per_tag=120, tiles_per_scroll=12, owners_per_tag=60, latency=0.05,
+                 grid_delay_ms=150, with_json=True, seed=1):
+        self.posts_per_tag = posts_per_tag
+        self.tiles_per_scroll = tiles_per_scroll
+        self.owners_per_tag = owners_per_tag
+        self.latency = latency
+        self.grid_delay_ms = grid_delay_ms
+        self.with_json = with_json
+        self.seed = seed
+        self.hits = {}
+        self.server = None
+        self.thread = None
+
+    # ---- synthetic data ----
+
+    def post_codes(self, tag):
+        return [f"{tag[:4]}{self.seed}x{i:04d}" for i in range(self.posts_per_tag)]
+
+    def post(self, code):
+        rng = _rng(self.seed, 'post', code)
+        if '~' in code:
+            # Recent posts on a profile grid carry their owner in the code
+            owner = code.split('~', 1)[1]
+        else:
+            owner = f"{code.split(f'{self.seed}x')[0]}_user{rng.randrange(self.owners_per_tag)}"
+        profile = self.profile(owner)
+        likes = max(0, int(profile['followers'] * profile['rate'] * rng.uniform(0.5, 1.5)))
+        return {'code': code, 'owner': owner, 'likes': likes, 'comments': likes // rng.randint(10, 40)}
+
+    def profile(self, username):
+        rng = _rng(self.seed, 'profile', username)
+        followers = int(10 ** rng.uniform(2, 6.5))
+        return {
+            'username': username,
+            'full_name': username.replace('_', ' ').title(),
+            'bio': f"Sharing {username.split('_')[0]} moments every day since {rng.randint(2012, 2023)}",
+            'category': rng.choice(CATEGORIES),
+            'followers': followers,
+            'following': rng.randint(50, 3000),
+            'posts': rng.randint(12, 2500),
+            # Engagement rate between 0.2% and 12%
+            'rate': rng.uniform(0.002, 0.12),
+            'recent': [f"r{i}{rng.randint(1000, 9999)}~{username}" for i in range(12)],
+        }
+
+    # ---- pages ----
+
+    def hashtag_page(self, tag):
+        codes = json.dumps(self.post_codes(tag))
+        return f"""<!DOCTYPE html><html><head><title>#{html.escape(tag)}</title></head>
+<body><main><article><div id="grid"></div></article></main>
+<script>
+const codes = {codes};
+let shown = 0, loading = false;
+function more() {{
+    const grid = document.getElementById('grid');
+    for (const code of codes.slice(shown, shown + {self.tiles_per_scroll})) {{
+        const a = document.createElement('a');
+        a.href = '/p/' + code + '/';
+        a.innerHTML = '<div style="display:block;height:300px">' + code + '</div>';
+        grid.appendChild(a);
+    }}
+    shown += {self.tiles_per_scroll};
+}}
+more();
+window.addEventListener('scroll', () => {{
+    if (loading || shown >= codes.length) return;
+    loading = true;
+    setTimeout(() => {{ more(); loading = false; }}, {self.grid_delay_ms});
+}});
+</script></body></html>"""
+
+    def post_page(self, code):
+        post = self.post(code)
+        owner = html.escape(post['owner'])
+        payload = ''
+        if self.with_json:
+            payload = json.dumps({'items': [{
+                'code': code, 'user': {'username': post['owner']},
+                'like_count': post['likes'], 'comment_count': post['comments'],
+            }]})
+            payload = f'<script type="application/json">{payload}</script>'
+        return f"""<!DOCTYPE html><html><body><main><article>
+<header><a href="/{owner}/" role="link">{owner}</a></header>
+<section><span><span>{post['likes']:,} likes</span></span><button><span>{post['comments']} comments</span></button></section>
+</article></main>{payload}</body></html>"""
+
+    def profile_page(self, username):
+        profile = self.profile(username)
+        recent = [self.post(code) for code in profile['recent']]
+        tiles = ''.join(f'<a href="/p/{p["code"]}/"><ul><li>{p["likes"]}</li><li>{p["comments"]}</li></ul></a>' for p in recent)
+        payload = ''
+        if self.with_json:
+            payload = json.dumps({'data': {'user': {
+                'username': username,
+                'full_name': profile['full_name'],
+                'biography': profile['bio'],
+                'category_name': profile['category'] or None,
+                'edge_followed_by': {'count': profile['followers']},
+                'edge_follow': {'count': profile['following']},
+                'edge_owner_to_timeline_media': {
+                    'count': profile['posts'],
+                    'edges': [{'node': {'shortcode': p['code'], 'edge_liked_by': {'count': p['likes']},
+                                        'edge_media_to_comment': {'count': p['comments']}}} for p in recent],
+                },
+            }}})
+            payload = f'<script type="application/json">{payload}</script>'
+        return f"""<!DOCTYPE html><html><body><header><section>
+<h2>{html.escape(username)}</h2>
+<ul><li>{profile['posts']:,} posts</li><li>{profile['followers']:,} followers</li><li>{profile['following']:,} following</li></ul>
+<div><h1>{html.escape(profile['full_name'])}</h1></div>
+<div><span>{html.escape(profile['category'])}</span></div>
+<div><div><span>{html.escape(profile['bio'])}</span></div></div>
+</section></header><main><article>{tiles}</article></main>{payload}</body></html>"""
+
+    def render(self, path):
+        """(status, html) for a path on the mock host"""
+        parts = [p for p in path.split('/') if p]
+        if len(parts) == 3 and parts[:2] == ['explore', 'tags']:
+            return 200, self.hashtag_page(parts[2])
+        if len(parts) == 2 and parts[0] in ('p', 'reel'):
+            return 200, self.post_page(parts[1])
+        if len(parts) == 1:
+            return 200, self.profile_page(parts[0])
+        return 404, '<html><body>Not found</body></html>'
+
+    # ---- server ----
+
+    def start(self, port=0):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if mock.latency:
+                    time.sleep(mock.latency)
+                path = urlparse(self.path).path
+                first = path.strip('/').split('/')[0]
+                kind = {'explore': 'hashtag', 'p': 'post', 'reel': 'post'}.get(first, 'profile')
+                mock.hits[kind] = mock.hits.get(kind, 0) + 1
+                status, body = mock.render(path)
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    async def install(self, context):
+        """Serve www.instagram.com from the mock server and drop every other host"""
+        base_url = self.base_url
+
+        async def handle(route):
+            url = urlparse(route.request.url)
+            if url.hostname != 'www.instagram.com':
+                await route.abort()
+                return
+            try:
+                response = await route.fetch(url=base_url + url.path)
+                await route.fulfill(response=response)
+            except:
+                # The page navigated away while the request was pending
+                pass
+
+        await context.route("**/*", handle)
@@ -0,0 +1,117 @@
+import time
+
+# We only read hrefs and text, so anything that is pure rendering weight can go
+DEFAULT_BLOCK_POLICY = {
+    'resource_types': ['image', 'media', 'font', 'stylesheet'],
+    'url_patterns': [
+        'google-analytics.com',
+        'googletagmanager.com',
+        'doubleclick.net',
+        'connect.facebook.net',
+        'facebook.com/tr',
+        '/logging_client_events',
+        '/ajax/bz',
+        '/falco',
+        'graph.instagram.com/logging',
+    ],
+    # Always let these through, even if their type or URL would be blocked
+    'allow_patterns': [
+        '/api/graphql',
+        '/graphql/query',
+        '/api/v1/',
+    ],
+}
+
+
+class TrafficMeter:
+    """Blocks heavy requests on a context and counts bytes and load times per stage.
+
+    Stages are tracked per page, so concurrent worker pages are attributed correctly.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy
+        self.page_stages = {}
+        self.bytes = {}
+        self.requests = {}
+        self.blocked = {}
+        self.load_times = {}
+
+    async def install(self, context):
+        if self.policy:
+            await context.route("**/*", self._route)
+        context.on("requestfinished", self._on_finished)
+
+    def set_stage(self, page, stage):
+        self.page_stages[id(page)] = stage
+
+    def forget(self, page):
+        self.page_stages.pop(id(page), None)
+
+    def record_load(self, stage, seconds):
+        self.load_times.setdefault(stage, []).append(seconds)
+
+    def _stage_for(self, request):
+        try:
+            return self.page_stages.get(id(request.frame.page), 'other')
+        except:
+            # Service worker requests have no frame
+            return 'other'
+
+    def should_block(self, request):
+        url = request.url
+        if any(pattern in url for pattern in self.policy.get('allow_patterns', [])):
+            return False
+        if request.resource_type in self.policy.get('resource_types', []):
+            return True
+        return any(pattern in url for pattern in self.policy.get('url_patterns', []))
+
+    async def _route(self, route):
+        request = route.request
+        try:
+            if self.should_block(request):
+                stage = self._stage_for(request)
+                self.blocked[stage] = self.blocked.get(stage, 0) + 1
+                await route.abort()
+            else:
+                # fallback, not continue_, so a route registered earlier (the benchmark's mock server) still applies
+                await route.fallback()
+        except:
+            # The page may have navigated away while the request was pending
+            pass
+
+    async def _on_finished(self, request):
+        stage = self._stage_for(request)
+        size = 0
+        try:
+            sizes = await request.sizes()
+            size = sizes.get('responseBodySize', 0) + sizes.get('responseHeadersSize', 0)
+        except:
+            pass
+        self.bytes[stage] = self.bytes.get(stage, 0) + max(0, size)
+        self.requests[stage] = self.requests.get(stage, 0) + 1
+
+    def report(self, profiles=0):
+        """Print bytes, requests, blocked requests and average load time per stage"""
+        print("\n=== NETWORK USAGE ===")
+        stages = sorted(set(self.bytes) | set(self.blocked) | set(self.load_times))
+        for stage in stages:
+            loads = self.load_times.get(stage, [])
+            avg_load = sum(loads) / len(loads) if loads else 0
+            print(f"  {stage}: {self.bytes.get(stage, 0) / 1024 / 1024:.2f} MB in {self.requests.get(stage, 0)} requests, "
+                  f"{self.blocked.get(stage, 0)} blocked, {len(loads)} loads avg {avg_load:.2f}s")
+        total = sum(self.bytes.values())
+        print(f"  Total: {total / 1024 / 1024:.2f} MB")
+        if profiles:
+            print(f"  Per accepted profile: {total / profiles / 1024:.1f} KB")
+
+
+async def timed_goto(page, url, timeout, meter=None, stage=None):
+    """page.goto that attributes the load and its traffic to a stage"""
+    if not meter or not stage:
+        return await page.goto(url, timeout=timeout)
+    meter.set_stage(page, stage)
+    start = time.monotonic()
+    response = await page.goto(url, timeout=timeout)
+    meter.record_load(stage, time.monotonic() - start)
+    return response
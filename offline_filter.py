@@ -0,0 +1,137 @@
+"""Re-apply filters to the page archive without opening a browser.
+
+Every post and profile a run visited is in the archive (see page_archive),
+including the ones its filters rejected. refilter() re-derives each profile
+from the archived payload and header snapshot with the engine's current
+parsers, so both new thresholds and improved extraction apply to old runs.
+"""
+import csv
+import os
+
+from filter_pipeline import CHECKS, STAGES
+from instagram_engine import (ScrapeConfig, engagement_sampler_for, header_counts_from, payload_engagement,
+                              profile_details_from, profile_engagement_ratio)
+from result_store import FIELDNAMES
+
+
+def derive_profile(profile_record, engagement_record=None):
+    """Profile dict as process_post builds it; recent_likes is None when engagement was never read.
+
+    A 'cached' record (the run used the profile cache, nothing was read from the
+    page) holds the extracted values as they were, not re-derivable ones.
+    """
+    if 'cached' in profile_record:
+        cached = profile_record['cached']
+        profile = {name: cached.get(name) for name in ['followers', 'following', 'posts', 'full_name', 'bio', 'profession']}
+        profile['followers'] = profile['followers'] or 0
+        profile['recent_likes'] = cached.get('recent_likes')
+        profile['recent_comments'] = cached.get('recent_comments')
+        if engagement_record:
+            profile['recent_likes'] = engagement_record['recent_likes']
+            profile['recent_comments'] = engagement_record['recent_comments']
+        return profile
+    structured = profile_record.get('structured')
+    snapshot = profile_record.get('snapshot')
+    profile = header_counts_from(structured, snapshot)
+    profile.update(profile_details_from(structured, snapshot))
+    profile['recent_likes'], profile['recent_comments'] = None, None
+    if engagement_record:
+        profile['recent_likes'] = engagement_record['recent_likes']
+        profile['recent_comments'] = engagement_record['recent_comments']
+    else:
+        recent = payload_engagement(structured)
+        if recent:
+            profile['recent_likes'] = [likes for likes, _ in recent]
+            profile['recent_comments'] = [comments for _, comments in recent]
+    return profile
+
+
+def refilter(archive, filters, hashtags=None, sampling=None):
+    """Rows that pass filters among the archived posts (of hashtags, if given), and counts of the rest.
+
+    A profile rejected on followers or profession in the original run never had
+    its engagement read; if it passes those stages now it is counted as
+    'unmeasured' instead of being guessed. The same goes for an engagement sample
+    that stopped early under other thresholds and does not settle these ones
+    (sampling holds the EngagementSampler settings, ScrapeConfig's by default).
+    """
+    sampling = sampling or ScrapeConfig().engagement_sampling()
+    # The newest page read of each profile; records from cache hits only stand in where no page was archived,
+    # and lend their engagement when no engagement record was archived
+    profiles = {}
+    engagements = {}
+    for visit, record in archive.visits('profile'):
+        if 'cached' not in record or 'cached' in profiles.get(visit['key'], (None, {'cached': None}))[1]:
+            profiles[visit['key']] = (visit, record)
+        if 'cached' in record and record['cached'].get('recent_likes') is not None:
+            engagements[visit['key']] = (visit, record['cached'])
+    engagements.update(archive.latest('engagement'))
+    derived = {}
+    rows = {}
+    counts = {'posts': 0, 'unresolved': 0, 'no_profile': 0, 'unmeasured': 0, 'duplicates': 0}
+    rejected = {stage: 0 for stage in STAGES}
+    for visit, post in archive.visits('post', hashtags):
+        counts['posts'] += 1
+        username = post.get('username')
+        if not username:
+            counts['unresolved'] += 1
+            continue
+        key = (visit['hashtag'], username)
+        if key in rows:
+            counts['duplicates'] += 1
+            continue
+        name = username.lower()
+        if name not in derived:
+            found = profiles.get(name)
+            engagement = engagements.get(name)
+            derived[name] = derive_profile(found[1], engagement[1] if engagement else None) if found else None
+        profile = derived[name]
+        if profile is None:
+            counts['no_profile'] += 1
+            continue
+        if profile['recent_likes'] is not None:
+            profile['engagement_ratio'] = profile_engagement_ratio(profile, sampling['estimator'])
+        for stage in STAGES:
+            if stage == 'engagement' and (profile['recent_likes'] is None or (
+                    profile['recent_likes'] and not engagement_sampler_for(profile, filters, sampling).done())):
+                counts['unmeasured'] += 1
+                break
+            if CHECKS[stage](profile, filters):
+                rejected[stage] += 1
+                break
+        else:
+            rows[key] = {
+                'hashtag': visit['hashtag'],
+                'username': username,
+                'full_name': profile['full_name'],
+                'bio': profile['bio'],
+                'profession': profile['profession'],
+                'followers': profile['followers'],
+                'following': profile['following'],
+                'posts': profile['posts'],
+                'engagement_ratio': profile['engagement_ratio'],
+                'profile_url': post.get('profile_url') or f"https://www.instagram.com/{username}/",
+                'post_url': visit['url'],
+            }
+    counts['rejected'] = rejected
+    counts['accepted'] = len(rows)
+    return list(rows.values()), counts
+
+
+def write_csv(rows, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def report(counts):
+    print("\n=== OFFLINE RE-FILTER ===")
+    print(f"  Archived posts: {counts['posts']} ({counts['duplicates']} repeats of a hashtag/profile pair)")
+    print(f"  Owner never resolved: {counts['unresolved']}, profile not archived: {counts['no_profile']}")
+    for stage in STAGES:
+        print(f"  Rejected at {stage}: {counts['rejected'][stage]}")
+    print(f"  Engagement not read, or too few posts for these thresholds: {counts['unmeasured']}")
+    print(f"  Passed all stages: {counts['accepted']}")
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+# Relative weight of each kind of deliberate pause against the controller's base delay
+PAUSE_WEIGHTS = {
+    'navigation': 0.5,
+    'popup': 0.3,
+    'scroll': 0.4,
+    'post': 0.6,
+    'profile': 2.0,
+}
+
+LOGIN_WALL_MARKERS = ['/accounts/login', '/challenge', '/accounts/suspended']
+
+
+class PacingController:
+    """AIMD pacing: delays shrink additively while loads are healthy and grow
+    multiplicatively on slow loads, empty selectors or login walls.
+
+    Also keeps the books on how much time went to deliberate pauses, to readiness
+    waits and to everything else. With several worker pages the pause and wait
+    totals are summed over workers, so they are reported per worker.
+    """
+
+    def __init__(self, base_delay=2.5, min_delay=0.5, max_delay=60.0, decrease_step=0.1,
+                 backoff_factor=2.0, slow_load_seconds=8.0, jitter=0.2, metrics=None):
+        self.delay = base_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.decrease_step = decrease_step
+        self.backoff_factor = backoff_factor
+        self.slow_load_seconds = slow_load_seconds
+        self.jitter = jitter
+        self.metrics = metrics
+        self.started = time.monotonic()
+        self.paused_seconds = 0.0
+        self.ready_wait_seconds = 0.0
+        self.healthy = 0
+        self.troubles = {}
+
+    def record_ok(self):
+        self.healthy += 1
+        self.delay = max(self.min_delay, self.delay - self.decrease_step)
+
+    def record_trouble(self, reason):
+        self.troubles[reason] = self.troubles.get(reason, 0) + 1
+        if self.metrics:
+            self.metrics.inc('pacing_troubles', reason=reason)
+        self.delay = min(self.max_delay, self.delay * self.backoff_factor)
+        print(f"  🐢 Backing off ({reason}), base delay now {self.delay:.1f}s")
+
+    def observe_load(self, page, seconds, response=None, outcome=None):
+        """Feed a finished navigation into the controller.
+
+        outcome is the circuit breaker's label for the load when there is a breaker,
+        so both back off on the same pages; without one the URL and status decide.
+        """
+        status = response.status if response else 0
+        if outcome is not None:
+            if outcome not in ('ok', 'empty'):
+                self.record_trouble(outcome)
+            elif seconds > self.slow_load_seconds:
+                self.record_trouble('slow_load')
+            else:
+                self.record_ok()
+        elif any(marker in page.url for marker in LOGIN_WALL_MARKERS):
+            self.record_trouble('login_wall')
+        elif status == 429 or status >= 500:
+            self.record_trouble(f'http_{status}')
+        elif seconds > self.slow_load_seconds:
+            self.record_trouble('slow_load')
+        else:
+            self.record_ok()
+
+    async def pause(self, kind='navigation'):
+        """Deliberate, jittered wait scaled from the current base delay"""
+        seconds = self.delay * PAUSE_WEIGHTS.get(kind, 1.0)
+        seconds *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.paused_seconds += seconds
+        if self.metrics:
+            self.metrics.observe('pause_seconds', seconds, kind=kind)
+        await asyncio.sleep(seconds)
+
+    async def settle(self, page, selector=None, timeout=10000):
+        """Wait until the page is actually usable instead of sleeping a fixed time.
+
+        Returns False (and backs off) when the expected selector never shows up.
+        """
+        start = time.monotonic()
+        try:
+            if selector:
+                await page.wait_for_selector(selector, timeout=timeout)
+            else:
+                await page.wait_for_load_state('domcontentloaded', timeout=timeout)
+            return True
+        except:
+            if any(marker in page.url for marker in LOGIN_WALL_MARKERS):
+                self.record_trouble('login_wall')
+            else:
+                self.record_trouble('empty_selector')
+            return False
+        finally:
+            waited = time.monotonic() - start
+            self.ready_wait_seconds += waited
+            if self.metrics:
+                self.metrics.observe('selector_wait_seconds', waited, selector=selector or 'domcontentloaded')
+
+    async def wait_for_growth(self, page, selector, previous_count, previous_last=None, timeout=5000):
+        """Wait until new grid tiles show up after a scroll.
+
+        The grid is virtualized, so besides a higher element count a changed last
+        href also counts as growth.
+        """
+        start = time.monotonic()
+        try:
+            await page.wait_for_function(
+                """([sel, n, last]) => {
+                    const els = document.querySelectorAll(sel);
+                    return els.length > n || (els.length > 0 && els[els.length - 1].href !== last);
+                }""",
+                arg=[selector, previous_count, previous_last], timeout=timeout
+            )
+            return True
+        except:
+            return False
+        finally:
+            self.ready_wait_seconds += time.monotonic() - start
+
+    def report(self, workers=1):
+        total = time.monotonic() - self.started
+        paused = self.paused_seconds / workers
+        ready_wait = self.ready_wait_seconds / workers
+        work = max(0.0, total - paused - ready_wait)
+        print("\n=== PACING ===")
+        print(f"  Wall clock: {total:.0f}s")
+        if total > 0:
+            print(f"  Deliberate pauses: {paused:.0f}s per worker ({paused / total * 100:.0f}%)")
+            print(f"  Readiness waits: {ready_wait:.0f}s per worker ({ready_wait / total * 100:.0f}%)")
+            print(f"  Other work: {work:.0f}s ({work / total * 100:.0f}%)")
+        print(f"  Final base delay: {self.delay:.1f}s, healthy loads: {self.healthy}, troubles: {self.troubles or 'none'}")
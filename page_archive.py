@@ -0,0 +1,145 @@
+"""Everything extracted from the pages a run visited, kept for offline re-filtering.
+
+Records are JSON documents stored once per distinct content (keyed by the
+sha256 of their canonical JSON) and compressed with zstd when the zstandard
+package is installed, gzip otherwise. A small index maps each visit (kind,
+key, hashtag, url, time) to its document, so a profile seen again with the
+same header costs one index row. offline_filter re-derives rows from it.
+"""
+import gzip
+import hashlib
+import json
+import sqlite3
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# post: a hashtag post and the owner it resolved to; profile: the header payload and DOM snapshot;
+# engagement: the recent likes and comments read for a profile
+KINDS = ['post', 'profile', 'engagement']
+
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("this archive holds zstd objects, install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageArchive:
+    """Content-addressed archive of extracted page data in one SQLite file.
+
+    put() stores a record (and with keep_raw the raw HTML and JSON payloads as a
+    separate object) and indexes the visit. Writes are committed in batches of
+    commit_every like the result store.
+    """
+
+    def __init__(self, path="page_archive.db", keep_raw=False, codec=None, commit_every=20):
+        self.path = path
+        self.keep_raw = keep_raw
+        self.codec = codec or ('zstd' if zstandard is not None else 'gzip')
+        self.commit_every = commit_every
+        self.stored = 0
+        self.deduplicated = 0
+        self._uncommitted = 0
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS visits (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                hashtag TEXT,
+                url TEXT,
+                fetched_at REAL NOT NULL,
+                object TEXT NOT NULL,
+                raw TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_visits_kind_key ON visits (kind, key, fetched_at)")
+        self.conn.commit()
+
+    def _put_object(self, obj):
+        data = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if self.conn.execute("SELECT 1 FROM objects WHERE hash = ?", (digest,)).fetchone():
+            self.deduplicated += 1
+        else:
+            self.conn.execute("INSERT INTO objects (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+                              (digest, self.codec, len(data), _compress(data, self.codec)))
+            self.stored += 1
+        return digest
+
+    def put(self, kind, key, record, raw=None, hashtag=None, url=None):
+        """Archive one visit; raw is only kept when the archive was opened with keep_raw"""
+        if not key:
+            return None
+        try:
+            digest = self._put_object(record)
+            raw_digest = self._put_object(raw) if raw is not None and self.keep_raw else None
+            self.conn.execute(
+                "INSERT INTO visits (kind, key, hashtag, url, fetched_at, object, raw) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, key.lower(), hashtag, url, time.time(), digest, raw_digest)
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+            return digest
+        except Exception as e:
+            print(f"  Error archiving {kind} {key}: {e}")
+            return None
+
+    def get(self, digest):
+        """The document stored under digest, or None"""
+        row = self.conn.execute("SELECT data, codec FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if not row:
+            return None
+        return json.loads(_decompress(row[0], row[1]).decode('utf-8'))
+
+    def visits(self, kind, hashtags=None):
+        """Yield (visit, record) for every archived visit of kind, oldest first"""
+        query = "SELECT key, hashtag, url, fetched_at, object, raw FROM visits WHERE kind = ?"
+        params = [kind]
+        if hashtags:
+            query += f" AND hashtag IN ({', '.join('?' for _ in hashtags)})"
+            params += list(hashtags)
+        for key, hashtag, url, fetched_at, digest, raw in self.conn.execute(query + " ORDER BY fetched_at", params).fetchall():
+            visit = {'key': key, 'hashtag': hashtag, 'url': url, 'fetched_at': fetched_at, 'raw': raw}
+            yield visit, self.get(digest)
+
+    def latest(self, kind):
+        """{key: (visit, record)} with the newest visit of each key"""
+        return {visit['key']: (visit, record) for visit, record in self.visits(kind)}
+
+    def stats(self):
+        counts = dict(self.conn.execute("SELECT kind, COUNT(*) FROM visits GROUP BY kind").fetchall())
+        objects, raw_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        stored_bytes = self.conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM objects").fetchone()[0]
+        return {'visits': {kind: counts.get(kind, 0) for kind in KINDS}, 'objects': objects,
+                'bytes': raw_bytes, 'compressed_bytes': stored_bytes}
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import time
+
+CACHED_FIELDS = ['followers', 'following', 'posts', 'recent_likes', 'recent_comments', 'full_name', 'bio', 'profession']
+
+
+class ProfileCache:
+    """On-disk cache of profile metrics keyed by username, shared across hashtags and runs.
+
+    Entries older than ttl seconds are ignored and dropped. When the cache holds more
+    than max_entries rows the least recently used ones are evicted.
+    """
+
+    def __init__(self, path="profile_cache.db", ttl=72 * 3600, max_entries=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        # Shard workers share the cache file: WAL lets them read while one writes, and
+        # a writer waits for the lock instead of failing with 'database is locked'
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                username TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_last_used ON profiles (last_used)")
+        self.conn.commit()
+
+    def get(self, username):
+        """Return the cached profile dict, or None if missing or older than the TTL"""
+        row = self.conn.execute(
+            "SELECT data, fetched_at FROM profiles WHERE username = ?", (username,)
+        ).fetchone()
+        now = time.time()
+        if not row:
+            self.misses += 1
+            return None
+        if now - row[1] > self.ttl:
+            self.conn.execute("DELETE FROM profiles WHERE username = ?", (username,))
+            self.conn.commit()
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE profiles SET last_used = ? WHERE username = ?", (now, username))
+        self.conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, username, profile):
+        now = time.time()
+        data = {field: profile.get(field) for field in CACHED_FIELDS}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO profiles (username, data, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+            (username, json.dumps(data), now, now)
+        )
+        self.conn.commit()
+        self._puts_since_evict += 1
+        if self._puts_since_evict >= 100:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        self._puts_since_evict = 0
+        self.conn.execute("DELETE FROM profiles WHERE fetched_at < ?", (time.time() - self.ttl,))
+        count = self.conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM profiles WHERE username IN "
+                "(SELECT username FROM profiles ORDER BY last_used ASC LIMIT ?)", (excess,)
+            )
+            print(f"Evicted {excess} least recently used profiles from cache")
+        self.conn.commit()
+
+    def close(self):
+        self.evict()
+        self.conn.close()
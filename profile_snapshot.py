@@ -0,0 +1,154 @@
+"""Everything the profile header shows, read in one page.evaluate.
+
+take_profile_snapshot returns a plain dict (JSON-serialisable); the parsers
+below turn it into counts, username and details in Python, with the same
+selector priorities and heuristics the per-element DOM reads used to apply.
+"""
+import re
+
+STAT_SELECTORS = [
+    'main section ul li a span',
+    'header section ul li span span',
+    'header section ul li a span',
+    'header section div span span',
+    '[data-testid="UserProfileHeader"] span'
+]
+USERNAME_SELECTORS = ['header h2', 'h1', 'header h1', '[data-testid="user_name"]', 'main section h1', 'main section h2']
+NAME_SELECTORS = ['header section div h1', 'header h1', 'main section div h1']
+BIO_SELECTORS = ['header section div div span', 'header section div span', 'main section div span']
+PROFESSION_SELECTORS = ['header section div span', 'header section div div', 'main section div span', 'main section div div']
+POST_LINK_SELECTORS = ['article a[href*="/p/"]', 'div a[href*="/p/"]', 'main a[href*="/p/"]']
+
+PROFILE_SNAPSHOT_JS = """
+([stat, usernames, names, bios, professions, posts]) => {
+    const text = (el) => el ? (el.textContent || '') : null;
+    const first = (selectors) => selectors.map(sel => text(document.querySelector(sel)));
+    const section = document.querySelector('header section');
+    return {
+        url: location.href,
+        statItems: Array.from(document.querySelectorAll('header section ul li')).map(text),
+        statSpans: stat.map(sel => Array.from(document.querySelectorAll(sel)).slice(0, 3).map(text)),
+        usernames: first(usernames),
+        names: first(names),
+        bios: first(bios),
+        headerTexts: section ? Array.from(section.querySelectorAll('div, span')).slice(0, 300).map(text) : [],
+        professions: first(professions),
+        postLinks: posts.map(sel => Array.from(document.querySelectorAll(sel)).slice(0, 24).map(e => e.href)),
+    };
+}
+"""
+
+
+async def take_profile_snapshot(page):
+    """The profile header as one dict, or None when the page could not be read"""
+    try:
+        return await page.evaluate(PROFILE_SNAPSHOT_JS, [STAT_SELECTORS, USERNAME_SELECTORS, NAME_SELECTORS,
+                                                         BIO_SELECTORS, PROFESSION_SELECTORS, POST_LINK_SELECTORS])
+    except Exception as e:
+        print(f"  Profile snapshot failed: {e}")
+        return None
+
+
+def parse_instagram_number(text):
+    """Parse Instagram number format (e.g., '1.2M', '45.3K', '1,234')"""
+    if not text:
+        return 0
+
+    # Remove commas and convert to lowercase
+    text = text.replace(',', '').lower().strip()
+
+    # Handle 'k' suffix (thousands)
+    if 'k' in text:
+        try:
+            number = float(text.replace('k', ''))
+            return int(number * 1000)
+        except:
+            return 0
+
+    # Handle 'm' suffix (millions)
+    elif 'm' in text:
+        try:
+            number = float(text.replace('m', ''))
+            return int(number * 1000000)
+        except:
+            return 0
+
+    # Handle 'b' suffix (billions)
+    elif 'b' in text:
+        try:
+            number = float(text.replace('b', ''))
+            return int(number * 1000000000)
+        except:
+            return 0
+
+    # Handle regular numbers
+    else:
+        try:
+            return int(float(text))
+        except:
+            return 0
+
+
+def counts_from_snapshot(snapshot):
+    """Posts, followers and following: labelled header items first, positional spans as the fallback"""
+    counts = {'followers': 0, 'following': 0, 'posts': 0}
+    if not snapshot:
+        return counts
+    items = snapshot.get('statItems') or []
+    labelled = len(items) >= 3
+    if labelled:
+        for text in items:
+            if not text:
+                continue
+            text = text.strip().replace('\n', ' ')
+            num_match = re.match(r'([\d.,KkMmBb]+)', text)
+            if num_match:
+                num = parse_instagram_number(num_match.group(1))
+                if 'followers' in text.lower():
+                    counts['followers'] = num
+                elif 'following' in text.lower():
+                    counts['following'] = num
+                elif 'post' in text.lower():
+                    counts['posts'] = num
+    if not labelled or counts['followers'] == 0:
+        for texts in snapshot.get('statSpans') or []:
+            texts = [t.strip() for t in texts if t]
+            if len(texts) >= 3:
+                counts['posts'] = parse_instagram_number(texts[0])
+                counts['followers'] = parse_instagram_number(texts[1])
+                counts['following'] = parse_instagram_number(texts[2])
+                print(f"  Fallback stats: {counts['posts']} posts, {counts['followers']} followers, {counts['following']} following")
+                break
+    return counts
+
+
+def username_from_snapshot(snapshot):
+    for text in (snapshot or {}).get('usernames') or []:
+        if text and text.strip():
+            return text.strip()
+    return None
+
+
+def details_from_snapshot(snapshot):
+    """Full name, bio and the profession/business label shown in the header"""
+    snapshot = snapshot or {}
+    full_name = next((t.strip() for t in snapshot.get('names') or [] if t and t.strip()), '')
+    bio = next((t.strip() for t in snapshot.get('bios') or [] if t and len(t) > 10), '')
+    # The label is usually the first header text that is neither the name nor the bio
+    candidates = [t.strip() for t in snapshot.get('headerTexts') or [] if t and t.strip()]
+    candidates = [t for t in candidates if t.lower() != full_name.lower() and t.lower() != bio.lower()]
+    if candidates:
+        profession = candidates[0]
+    else:
+        profession = next((t.strip() for t in snapshot.get('professions') or []
+                           if t and t.strip() and t.strip().lower() not in (full_name.lower(), bio.lower())), '')
+    return {'full_name': full_name, 'bio': bio, 'profession': profession}
+
+
+def post_links_from_snapshot(snapshot, limit=5):
+    """Recent post links from the first selector that found any"""
+    for links in (snapshot or {}).get('postLinks') or []:
+        links = [link for link in links if link and '/p/' in link]
+        if links:
+            return links[:limit]
+    return []
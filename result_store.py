@@ -0,0 +1,152 @@
+import csv
+import glob
+import os
+import sqlite3
+import time
+
+FIELDNAMES = ['hashtag', 'username', 'full_name', 'bio', 'profession', 'followers', 'following', 'posts', 'engagement_ratio', 'profile_url', 'post_url']
+
+
+class ResultStore:
+    """Accepted profiles in an indexed SQLite database (WAL mode).
+
+    Dedup is an indexed lookup on (hashtag, username) instead of a full CSV load,
+    and the CSV file is produced on demand with export_csv. Rows are committed in
+    batches of commit_every, so a crash loses at most one small batch.
+    """
+
+    def __init__(self, path="user_profiles.db", commit_every=5):
+        self.path = path
+        self.commit_every = commit_every
+        self.rows_added = 0
+        self._uncommitted = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS profiles (
+                {', '.join(f'{name} TEXT' for name in FIELDNAMES)},
+                scraped_at REAL
+            )
+        """)
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_profiles_tag_user ON profiles (hashtag, username)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_user ON profiles (username)")
+        # CSV files already folded in, so unchanged files are not re-read on every start
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS imported_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL
+            )
+        """)
+        self.conn.commit()
+
+    def has(self, hashtag, username):
+        return self.conn.execute(
+            "SELECT 1 FROM profiles WHERE hashtag = ? AND username = ? LIMIT 1", (hashtag, username)
+        ).fetchone() is not None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def add(self, row):
+        """Insert one accepted row; returns False if (hashtag, username) was already stored"""
+        cursor = self.conn.execute(
+            f"INSERT OR IGNORE INTO profiles ({', '.join(FIELDNAMES)}, scraped_at) "
+            f"VALUES ({', '.join('?' for _ in FIELDNAMES)}, ?)",
+            [row.get(name) for name in FIELDNAMES] + [time.time()]
+        )
+        if cursor.rowcount:
+            self.rows_added += 1
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+        return bool(cursor.rowcount)
+
+    @property
+    def uncommitted(self):
+        """Rows added since the last commit"""
+        return self._uncommitted
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def _file_signature(self, path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+
+    def _mark_imported(self, path):
+        size, mtime = self._file_signature(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO imported_files (path, size, mtime) VALUES (?, ?, ?)",
+            (os.path.abspath(path), size, mtime)
+        )
+        self.conn.commit()
+
+    def import_csv(self, path):
+        """Fold a CSV of results into the store, skipping it if unchanged since the last import"""
+        if not os.path.exists(path):
+            return 0
+        saved = self.conn.execute(
+            "SELECT size, mtime FROM imported_files WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+        if saved and tuple(saved) == self._file_signature(path):
+            return 0
+        imported = 0
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if row.get('hashtag') and row.get('username') and self.add(row):
+                        imported += 1
+            self.commit()
+            self._mark_imported(path)
+            print(f"Imported {imported} new rows from {path}")
+        except Exception as e:
+            print(f"Error importing {path}: {e}")
+        return imported
+
+    def import_existing(self, output_file):
+        """Import the output CSV and every _backup_N.csv written while it was locked"""
+        base_name = output_file.replace('.csv', '')
+        total = 0
+        for path in [output_file] + sorted(glob.glob(f"{base_name}_backup_*.csv")):
+            total += self.import_csv(path)
+        return total
+
+    def export_csv(self, path, max_attempts=3):
+        """Write every stored row to path, falling back to backup names if it is locked.
+
+        Returns the path actually written, or None.
+        """
+        for attempt in range(1, max_attempts + 1):
+            current_path = path
+            if attempt > 1:
+                base_name = path.replace('.csv', '')
+                current_path = f"{base_name}_backup_{attempt}.csv"
+                print(f"Attempt {attempt}: Trying to save as {current_path}")
+            tmp_path = current_path + '.tmp'
+            try:
+                with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(FIELDNAMES)
+                    writer.writerows(self.conn.execute(
+                        f"SELECT {', '.join(FIELDNAMES)} FROM profiles ORDER BY rowid"
+                    ))
+                os.replace(tmp_path, current_path)
+                # Our own export holds nothing new, so the next start does not re-read it
+                self._mark_imported(current_path)
+                print(f"Exported {self.count()} profiles to {current_path}")
+                return current_path
+            except PermissionError as e:
+                print(f"Attempt {attempt} failed - Permission denied: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                if attempt < max_attempts:
+                    print("The file might be open in Excel or another program.")
+                    print("Trying backup filename...")
+        return None
+
+    def close(self):
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; covers selector waits (ms) up to slow page loads (a minute)
+DEFAULT_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60]
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels, extra=None):
+    pairs = list(labels) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    escaped = ['{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs]
+    return '{' + ','.join(escaped) + '}'
+
+
+class RunMetrics:
+    """Latency histograms, counters and gauges for one scraping run.
+
+    observe/inc/set_gauge take keyword labels, e.g.
+    observe('page_load_seconds', 1.2, stage='profile'). Recording is a dict
+    update and a bucket scan, cheap enough for the hot path. export() writes a
+    JSON snapshot and a Prometheus text file; export_every() does it periodically.
+    """
+
+    def __init__(self, buckets=None, prefix="scraper"):
+        self.buckets = list(buckets or DEFAULT_BUCKETS)
+        self.prefix = prefix
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.collectors = []
+
+    def observe(self, name, seconds, **labels):
+        hist = self.histograms.get(_key(name, labels))
+        if hist is None:
+            hist = self.histograms[_key(name, labels)] = {
+                'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0, 'max': 0.0
+            }
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                hist['counts'][i] += 1
+                break
+        hist['sum'] += seconds
+        hist['count'] += 1
+        hist['max'] = max(hist['max'], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        self.gauges[_key(name, labels)] = value
+
+    def add_collector(self, collect):
+        """collect(metrics) runs before every export, to refresh gauges from other objects"""
+        self.collectors.append(collect)
+
+    def _quantile(self, hist, q):
+        """Bucket upper bound below which a fraction q of observations fall"""
+        target = q * hist['count']
+        seen = 0
+        for bound, count in zip(self.buckets, hist['counts']):
+            seen += count
+            if seen >= target:
+                return bound
+        return hist['max']
+
+    def snapshot(self):
+        histograms = []
+        for (name, labels), hist in sorted(self.histograms.items()):
+            histograms.append({
+                'name': name,
+                'labels': dict(labels),
+                'count': hist['count'],
+                'sum': round(hist['sum'], 3),
+                'mean': round(hist['sum'] / hist['count'], 3) if hist['count'] else 0,
+                'p50': self._quantile(hist, 0.5),
+                'p90': self._quantile(hist, 0.9),
+                'max': round(hist['max'], 3),
+                'buckets': dict(zip([str(b) for b in self.buckets], hist['counts'])),
+            })
+        return {
+            'started': self.started,
+            'elapsed_seconds': round(time.time() - self.started, 1),
+            'histograms': histograms,
+            'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in sorted(self.counters.items())],
+            'gauges': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in sorted(self.gauges.items())],
+        }
+
+    def prometheus_text(self):
+        lines = []
+        typed = set()
+
+        def header(metric, kind):
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for (name, labels), hist in sorted(self.histograms.items()):
+            metric = f"{self.prefix}_{name}"
+            header(metric, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets, hist['counts']):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_label_text(labels, {'le': bound})} {cumulative}")
+            lines.append(f"{metric}_bucket{_label_text(labels, {'le': '+Inf'})} {hist['count']}")
+            lines.append(f"{metric}_sum{_label_text(labels)} {hist['sum']:.6f}")
+            lines.append(f"{metric}_count{_label_text(labels)} {hist['count']}")
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{self.prefix}_{name}_total"
+            header(metric, 'counter')
+            lines.append(f"{metric}{_label_text(labels)} {value}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            metric = f"{self.prefix}_{name}"
+            header(metric, 'gauge')
+            lines.append(f"{metric}{_label_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _write(self, path, text):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def export(self, json_path=None, prometheus_path=None):
+        for collect in self.collectors:
+            try:
+                collect(self)
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        try:
+            if json_path:
+                self._write(json_path, json.dumps(self.snapshot(), indent=2))
+            if prometheus_path:
+                self._write(prometheus_path, self.prometheus_text())
+        except Exception as e:
+            print(f"Error writing run metrics: {e}")
+
+    async def export_every(self, interval, json_path=None, prometheus_path=None):
+        """Export every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            self.export(json_path, prometheus_path)
+
+    def report(self):
+        """Print where the time went, slowest total first"""
+        print("\n=== STAGE TIMINGS ===")
+        rows = sorted(self.snapshot()['histograms'], key=lambda h: -h['sum'])
+        for hist in rows:
+            labels = ','.join(f"{k}={v}" for k, v in hist['labels'].items())
+            name = f"{hist['name']}[{labels}]" if labels else hist['name']
+            print(f"  {name}: {hist['count']} x {hist['mean']:.2f}s = {hist['sum']:.0f}s (p90 <= {hist['p90']}s)")
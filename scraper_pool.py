@@ -0,0 +1,322 @@
+import asyncio
+import time
+
+from browser_memory import chromium_memory, psutil
+from network_policy import timed_goto
+
+
+class BudgetExhausted(Exception):
+    """Raised when the session has used up its navigation budget"""
+
+
+class RequestBudget:
+    """Per-session navigation budget with a minimum spacing between requests"""
+
+    def __init__(self, max_requests, min_interval=0.0):
+        self.max_requests = max_requests
+        self.min_interval = min_interval
+        self.used = 0
+        self._last_request = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def remaining(self):
+        return max(0, self.max_requests - self.used)
+
+    @property
+    def exhausted(self):
+        return self.used >= self.max_requests
+
+    async def acquire(self):
+        async with self._lock:
+            if self.exhausted:
+                raise BudgetExhausted(f"Session request budget of {self.max_requests} used up")
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request = time.monotonic()
+            self.used += 1
+
+
+class PagePool:
+    """N pages in one logged-in context, with a global cap on concurrent navigations.
+
+    With a breaker (circuit_breaker.CircuitBreaker) every navigation first waits
+    for it to let requests through, and a load that Instagram blocked is retried
+    once the breaker allows it again, so callers only ever get a usable page.
+
+    Long runs keep Chromium's memory flat by recycling: a worker page is replaced
+    after recycle_after navigations, and with a context_factory(storage_state)
+    the whole context is rebuilt from its current storage state (so the login
+    carries over) after context_recycle_after navigations or once Chromium's RSS
+    passes max_rss_mb (sampled every memory_check_interval seconds, needs psutil).
+    Recycling only happens in enter(), between items, so no work is cut short;
+    a context recycle first waits until every worker is between items.
+    on_page_replaced(old, new) is told about extra pages moved to the new context.
+    """
+
+    def __init__(self, context, size=3, max_concurrency=2, budget=None, meter=None, pacer=None, collector=None,
+                 metrics=None, breaker=None, recycle_after=0, context_factory=None, context_recycle_after=0,
+                 max_rss_mb=None, memory_check_interval=30.0, on_page_replaced=None):
+        self.context = context
+        self.metrics = metrics
+        self.breaker = breaker
+        self.meter = meter
+        self.pacer = pacer
+        self.collector = collector
+        self.size = max(1, size)
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.budget = budget or RequestBudget(float('inf'))
+        self.pages = []
+        self.extra_pages = []
+        self.extra_headers = None
+        self.recycle_after = recycle_after
+        self.context_factory = context_factory
+        self.context_recycle_after = context_recycle_after
+        self.max_rss_mb = max_rss_mb if psutil is not None else None
+        self.memory_check_interval = memory_check_interval
+        self.on_page_replaced = on_page_replaced
+        self.navigations = {}
+        self.context_navigations = 0
+        self.recycles = {'page': 0, 'context': 0}
+        self.memory = None
+        self.peak_rss_mb = None
+        self._last_memory_check = 0.0
+        self._in_use = 0
+        self._idle = asyncio.Event()
+        self._gate = asyncio.Event()
+        self._gate.set()
+        self._replaced = {}
+        if max_rss_mb and psutil is None:
+            print("psutil is not installed, the browser context will not be recycled on memory")
+
+    async def _new_page(self):
+        page = await self.context.new_page()
+        if self.extra_headers:
+            await page.set_extra_http_headers(self.extra_headers)
+        return page
+
+    async def start(self, extra_headers=None):
+        self.extra_headers = extra_headers
+        for _ in range(self.size):
+            self.pages.append(await self._new_page())
+        print(f"Started page pool with {self.size} pages")
+        return self.pages
+
+    async def open_extra_page(self):
+        """A page outside the worker set (e.g. a hashtag grid kept open), closed with the pool"""
+        page = await self._new_page()
+        self.extra_pages.append(page)
+        return page
+
+    async def goto(self, page, url, timeout=60000, stage=None, server_error_retries=2):
+        """Navigate through the pool so every load counts against the cap and budget.
+
+        A 5xx answer is retried server_error_retries times (the pacer backs off in
+        between), then the page is handed back as it is.
+        """
+        server_errors = 0
+        while True:
+            token = await self.breaker.acquire() if self.breaker else None
+            await self.budget.acquire()
+            async with self.semaphore:
+                if self.collector:
+                    self.collector.reset(page)
+                self.navigations[page] = self.navigations.get(page, 0) + 1
+                self.context_navigations += 1
+                start = time.monotonic()
+                try:
+                    response = await timed_goto(page, url, timeout, self.meter, stage)
+                except Exception:
+                    if self.breaker:
+                        self.breaker.record('error', token)
+                    raise
+                seconds = time.monotonic() - start
+                if self.metrics:
+                    self.metrics.observe('page_load_seconds', seconds, stage=stage or 'other')
+            outcome = await self.breaker.classify(page, response) if self.breaker else None
+            if self.pacer:
+                self.pacer.observe_load(page, seconds, response, outcome)
+            if not self.breaker:
+                return response
+            if self.breaker.record(outcome, token):
+                return response
+            if outcome == 'server_error':
+                server_errors += 1
+                if server_errors > server_error_retries:
+                    print(f"  ⚠️ {stage or 'page'} load kept failing with HTTP {response.status}, giving up on it")
+                    return response
+                print(f"  🚧 {stage or 'page'} load got HTTP {response.status}, retrying")
+                if self.pacer:
+                    await self.pacer.pause('navigation')
+                continue
+            print(f"  🚧 {stage or 'page'} load got {outcome}, retrying when the circuit breaker allows")
+
+    def sample_memory(self):
+        """Current Chromium memory (see browser_memory), also kept as gauges"""
+        self._last_memory_check = time.monotonic()
+        self.memory = chromium_memory()
+        if self.memory:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0, self.memory['rss_mb'])
+            if self.metrics:
+                self.metrics.set_gauge('browser_rss_mb', self.memory['rss_mb'])
+                self.metrics.set_gauge('renderer_rss_mb', self.memory['renderer_rss_mb'])
+                self.metrics.set_gauge('renderer_processes', self.memory['renderers'])
+        return self.memory
+
+    def _context_due(self):
+        """Why the context should be rebuilt now, or None"""
+        if psutil is not None and time.monotonic() - self._last_memory_check >= self.memory_check_interval:
+            self.sample_memory()
+        if not self.context_factory:
+            return None
+        if self.context_recycle_after and self.context_navigations >= self.context_recycle_after:
+            return f"{self.context_navigations} navigations"
+        # A few navigations in between, so a browser that stays big is not rebuilt over and over
+        if (self.max_rss_mb and self.memory and self.memory['rss_mb'] > self.max_rss_mb
+                and self.context_navigations >= 2 * self.size):
+            return f"Chromium reached {self.memory['rss_mb']:.0f} MB"
+        return None
+
+    def _forget(self, page):
+        self.navigations.pop(page, None)
+        if self.collector:
+            self.collector.forget(page)
+        if self.meter:
+            self.meter.forget(page)
+
+    def _recycled(self, scope, reason):
+        self.recycles[scope] += 1
+        if self.metrics:
+            self.metrics.inc('browser_recycles', scope=scope)
+        print(f"  ♻️ Recycled the {scope} after {reason}")
+
+    async def _replace_page(self, page):
+        new_page = await self._new_page()
+        self.pages[self.pages.index(page)] = new_page
+        navigations = self.navigations.get(page, 0)
+        self._forget(page)
+        try:
+            await page.close()
+        except:
+            pass
+        self._recycled('page', f"{navigations} navigations")
+        return new_page
+
+    async def _recycle_context(self, reason):
+        self._gate.clear()
+        try:
+            while self._in_use:
+                self._idle.clear()
+                await self._idle.wait()
+            old_context = self.context
+            # Cookies and local storage as they are now, including anything refreshed during the run
+            self.context = await self.context_factory(await old_context.storage_state())
+            for i, page in enumerate(self.pages):
+                self.pages[i] = await self._new_page()
+                self._replaced[page] = self.pages[i]
+                self._forget(page)
+            for i, page in enumerate(self.extra_pages):
+                self.extra_pages[i] = await self._new_page()
+                self._forget(page)
+                if self.on_page_replaced:
+                    self.on_page_replaced(page, self.extra_pages[i])
+            try:
+                await old_context.close()
+            except:
+                pass
+            self.context_navigations = 0
+            self._recycled('context', reason)
+            self.sample_memory()
+        finally:
+            self._gate.set()
+
+    async def enter(self, page):
+        """A worker is about to take its next item; returns the page to do it on.
+        Every enter() must be paired with a leave() once the item is done."""
+        while not self._gate.is_set():
+            await self._gate.wait()
+        reason = self._context_due()
+        if reason:
+            await self._recycle_context(reason)
+        page = self._replaced.pop(page, page)
+        if self.recycle_after and self.navigations.get(page, 0) >= self.recycle_after:
+            page = await self._replace_page(page)
+        self._in_use += 1
+        return page
+
+    def leave(self):
+        self._in_use -= 1
+        if not self._in_use:
+            self._idle.set()
+
+    def report(self):
+        print("\n=== BROWSER MEMORY ===")
+        print(f"  Recycled {self.recycles['page']} pages and {self.recycles['context']} contexts")
+        memory = self.sample_memory()
+        if memory:
+            print(f"  Chromium now {memory['rss_mb']:.0f} MB ({memory['renderer_rss_mb']:.0f} MB in "
+                  f"{memory['renderers']} renderers), peak seen {self.peak_rss_mb:.0f} MB")
+
+    async def close(self):
+        for page in self.pages + self.extra_pages:
+            try:
+                await page.close()
+            except:
+                pass
+        self.pages = []
+        self.extra_pages = []
+
+
+async def run_workers_from(pages, source, handler, should_stop=None, pool=None):
+    """Run one worker per page on items pulled from an async iterator on demand;
+    handler(page, item) does the work.
+
+    Workers take turns advancing source, so it only produces (scrolls, loads)
+    when a page is free to take the next item. With pool (a PagePool) each worker
+    goes through pool.enter() between items, where its page may be recycled.
+    """
+    lock = asyncio.Lock()
+    iterator = source.__aiter__()
+    exhausted = False
+
+    async def next_item():
+        nonlocal exhausted
+        async with lock:
+            if exhausted:
+                raise StopAsyncIteration
+            try:
+                return await iterator.__anext__()
+            except StopAsyncIteration:
+                exhausted = True
+                raise
+
+    async def worker(worker_id, page):
+        while True:
+            if should_stop and should_stop():
+                return
+            if pool:
+                page = await pool.enter(page)
+            try:
+                try:
+                    item = await next_item()
+                except StopAsyncIteration:
+                    return
+                try:
+                    await handler(page, item)
+                except BudgetExhausted:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ Worker {worker_id} failed on {item}: {e}")
+            finally:
+                if pool:
+                    pool.leave()
+
+    try:
+        results = await asyncio.gather(*(worker(i + 1, page) for i, page in enumerate(pages)), return_exceptions=True)
+    finally:
+        if hasattr(iterator, 'aclose'):
+            await iterator.aclose()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import math
+import os
+import struct
+import uuid
+
+from file_lock import locked, tmp_path
+
+
+def seen_key(tag, shortcode):
+    """Filter key of a post processed under tag; the same post under another hashtag is a different row"""
+    if not shortcode:
+        return None
+    return f"{(tag or '').lower()}/{shortcode}"
+
+
+class SeenPostFilter:
+    """Persistent Bloom filter of posts already processed, shared across runs, keyed by seen_key.
+
+    Membership is O(1) and memory is fixed by capacity and error_rate
+    (about 1.8 MB per 1M posts at 0.1%). When the current generation is full it
+    becomes the previous one and a fresh generation starts, so memory stays
+    at two generations and very old posts eventually become visitable again.
+    save() ORs in whatever another process wrote to the same file meanwhile, under
+    a file lock so concurrent shard workers never drop each other's posts.
+    """
+
+    def __init__(self, path="seen_posts.bloom", capacity=500000, error_rate=0.001, save_every=50):
+        self.path = path
+        self.capacity = capacity
+        self.save_every = save_every
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.generations = [self._new_generation()]
+        self._unsaved = 0
+        self.hits = 0
+        if path and os.path.exists(path):
+            saved = self._read(path)
+            if saved:
+                self.generations = saved
+                print(f"Seen-post filter: {sum(g['count'] for g in saved)} posts remembered")
+
+    def _new_generation(self):
+        return {'id': uuid.uuid4().hex, 'count': 0, 'data': bytearray((self.bits + 7) // 8)}
+
+    def _positions(self, shortcode):
+        digest = hashlib.blake2b(shortcode.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _in_generation(self, generation, positions):
+        data = generation['data']
+        return all(data[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def __contains__(self, shortcode):
+        if not shortcode:
+            return False
+        positions = self._positions(shortcode)
+        if any(self._in_generation(g, positions) for g in self.generations):
+            self.hits += 1
+            return True
+        return False
+
+    def add(self, shortcode):
+        if not shortcode:
+            return
+        positions = self._positions(shortcode)
+        current = self.generations[0]
+        if self._in_generation(current, positions):
+            return
+        for p in positions:
+            current['data'][p >> 3] |= 1 << (p & 7)
+        current['count'] += 1
+        if current['count'] >= self.capacity:
+            print(f"Seen-post filter reached {self.capacity} posts, starting a new generation")
+            self.generations = [self._new_generation(), current]
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                (header_size,) = struct.unpack('<I', f.read(4))
+                header = json.loads(f.read(header_size))
+                if header['bits'] != self.bits or header['hashes'] != self.hashes:
+                    print("Seen-post filter was built with a different size, starting a new one")
+                    return None
+                size = (self.bits + 7) // 8
+                generations = []
+                for saved in header['generations']:
+                    data = bytearray(f.read(size))
+                    if len(data) != size:
+                        raise ValueError("truncated file")
+                    generations.append({'id': saved['id'], 'count': saved['count'], 'data': data})
+                return generations or None
+        except Exception as e:
+            print(f"Error reading seen-post filter: {e}")
+            return None
+
+    def save(self):
+        if not self.path:
+            return
+        self._unsaved = 0
+        with locked(self.path):
+            self._merge_and_write()
+
+    def _merge_and_write(self):
+        # Merge generations another process saved since we loaded, matching them by id
+        saved = (self._read(self.path) or []) if os.path.exists(self.path) else []
+        on_disk = {g['id']: g for g in saved}
+        for generation in self.generations:
+            other = on_disk.get(generation['id'])
+            if other:
+                self._or_into(generation, other)
+                generation['count'] = max(generation['count'], other['count'])
+        # Generations started since the last shared one: both processes started one when the file was
+        # missing, or one of them rotated. Fold ours into the one on disk so neither side's posts are lost
+        ours = [g for g in self.generations if g['id'] not in on_disk]
+        theirs = [g for g in saved if g['id'] not in {g['id'] for g in self.generations}]
+        if ours and theirs:
+            for generation in ours:
+                self._or_into(theirs[0], generation)
+                theirs[0]['count'] += generation['count']
+            ours = []
+        shared = [g for g in self.generations if g['id'] in on_disk]
+        self.generations = (theirs + ours + shared)[:2]
+        header = json.dumps({
+            'bits': self.bits,
+            'hashes': self.hashes,
+            'generations': [{'id': g['id'], 'count': g['count']} for g in self.generations],
+        }).encode('utf-8')
+        tmp = tmp_path(self.path)
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(struct.pack('<I', len(header)))
+                f.write(header)
+                for generation in self.generations:
+                    f.write(generation['data'])
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Error saving seen-post filter: {e}")
+
+    @staticmethod
+    def _or_into(generation, other):
+        size = len(generation['data'])
+        merged = int.from_bytes(generation['data'], 'little') | int.from_bytes(other['data'], 'little')
+        generation['data'] = bytearray(merged.to_bytes(size, 'little'))
+
+    def close(self):
+        self.save()
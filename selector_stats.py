@@ -0,0 +1,42 @@
+import json
+import os
+
+
+class SelectorStats:
+    """Per-strategy hit rates persisted between runs, used to order selector races"""
+
+    def __init__(self, path="selector_stats.json"):
+        self.path = path
+        self.stats = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except Exception as e:
+                print(f"Error reading selector stats: {e}")
+
+    def hit_rate(self, name):
+        entry = self.stats.get(name, {})
+        # Laplace smoothing so unseen strategies start at 0.5
+        return (entry.get('hits', 0) + 1) / (entry.get('tries', 0) + 2)
+
+    def ordered(self, strategies):
+        """Sort strategies by learned hit rate; ties keep the hand-tuned order"""
+        indexed = list(enumerate(strategies))
+        indexed.sort(key=lambda item: (-self.hit_rate(item[1]['name']), item[0]))
+        return [strategy for _, strategy in indexed]
+
+    def record(self, name, hit):
+        entry = self.stats.setdefault(name, {'tries': 0, 'hits': 0})
+        entry['tries'] += 1
+        if hit:
+            entry['hits'] += 1
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, indent=2)
+        except Exception as e:
+            print(f"Error saving selector stats: {e}")
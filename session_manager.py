@@ -0,0 +1,229 @@
+"""Named Instagram login sessions: saving, cheap validation and health tracking.
+
+A session is a Playwright storage state file (what Login.py writes). The
+registry (sessions.json) maps a name to its file plus metadata: when it was
+saved, last used and last validated, and its health. Validation is one small
+authenticated request, no browser, and its result is cached for a few minutes.
+"""
+import asyncio
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+from file_lock import locked, tmp_path
+
+SESSION_COOKIE = 'sessionid'
+# Returns the logged-in user as JSON, or a login redirect / 401-403 when the session is dead
+VALIDATION_URL = "https://www.instagram.com/api/v1/accounts/current_user/?edit=true"
+WEB_APP_ID = "936619743392459"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# healthy: validated logged in; expired: Instagram no longer accepts it;
+# flagged: the scraper hit challenges or login walls with it; unknown: not checked yet or check inconclusive
+HEALTH_STATES = ['healthy', 'unknown', 'flagged', 'expired']
+
+
+class SessionExpired(Exception):
+    """The login session can not be used; run Login.py again"""
+
+
+def session_cookie(state):
+    """The sessionid cookie in a storage state dict, or None"""
+    for cookie in state.get('cookies', []):
+        if cookie.get('name') == SESSION_COOKIE and cookie.get('value') and 'instagram.com' in cookie.get('domain', ''):
+            return cookie
+    return None
+
+
+async def wait_for_login(context, timeout=300, poll=1.0):
+    """Wait until the context holds an Instagram session cookie; True once logged in, False on timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        cookies = await context.cookies("https://www.instagram.com")
+        if any(c['name'] == SESSION_COOKIE and c['value'] for c in cookies):
+            return True
+        await asyncio.sleep(poll)
+    return False
+
+
+def check_state_file(path, timeout=10):
+    """Validate a storage state file; returns (health, reason).
+
+    Missing or expired session cookies are caught without any request. Otherwise
+    one request is made; network errors give 'unknown' so an offline check never
+    blocks a run on its own.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except Exception as e:
+        return 'expired', f"cannot read {path}: {e}"
+    cookie = session_cookie(state)
+    if not cookie:
+        return 'expired', "no sessionid cookie, not logged in"
+    expires = cookie.get('expires', -1)
+    if expires and 0 < expires < time.time():
+        return 'expired', "sessionid cookie has expired"
+
+    cookies = '; '.join(f"{c['name']}={c['value']}" for c in state.get('cookies', [])
+                        if 'instagram.com' in c.get('domain', ''))
+    request = urllib.request.Request(VALIDATION_URL, headers={
+        'Cookie': cookies,
+        'User-Agent': USER_AGENT,
+        'X-IG-App-ID': WEB_APP_ID,
+        'Accept': 'application/json',
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            final_url = response.geturl()
+            body = response.read(200000)
+    except urllib.error.HTTPError as e:
+        if e.code in (401, 403):
+            return 'expired', f"Instagram answered {e.code}"
+        return 'unknown', f"Instagram answered {e.code}"
+    except Exception as e:
+        return 'unknown', f"could not reach Instagram: {e}"
+    if '/accounts/login' in final_url:
+        return 'expired', "redirected to the login page"
+    if '/challenge' in final_url:
+        return 'flagged', "redirected to a challenge"
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return 'unknown', "unexpected response"
+    if data.get('user'):
+        return 'healthy', f"logged in as {data['user'].get('username', '?')}"
+    if data.get('message') == 'login_required':
+        return 'expired', "login required"
+    if data.get('message') == 'checkpoint_required':
+        return 'flagged', "checkpoint required"
+    return 'unknown', "unexpected response"
+
+
+class SessionManager:
+    """Registry of named session files with last-used and health metadata.
+
+    Every change is written straight back (atomically), so several processes can
+    share one registry; each update re-reads the file first under a file lock.
+    """
+
+    def __init__(self, path="sessions.json", session_dir="sessions", validation_ttl=600):
+        self.path = path
+        self.session_dir = session_dir
+        self.validation_ttl = validation_ttl
+        self.sessions = self._load()
+
+    def _load(self):
+        return self._read() or {}
+
+    def _read(self):
+        """Registry on disk: {} when there is none yet, None when it can not be read"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('sessions', {})
+        except Exception as e:
+            print(f"Error reading session registry: {e}")
+            return None
+
+    def _update(self, name, **fields):
+        with locked(self.path):
+            saved = self._read()
+            if saved is not None:
+                self.sessions = saved
+            entry = self.sessions.setdefault(name, {'file': None, 'health': 'unknown'})
+            entry.update(fields)
+            if saved is None:
+                # Writing now would replace every other session's entry with what this process knows
+                print("Session registry not saved, fix or delete it first")
+                return entry
+            tmp = tmp_path(self.path)
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({'sessions': self.sessions}, f, indent=2)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                print(f"Error saving session registry: {e}")
+        return entry
+
+    def key(self, name):
+        """Registry key for a session name or file path; unregistered paths are keyed by themselves"""
+        if name in self.sessions:
+            return name
+        for key, entry in self.sessions.items():
+            if entry.get('file') == name:
+                return key
+        return name
+
+    def file_for(self, name):
+        """Session file for a registered name; anything else is taken as a path"""
+        entry = self.sessions.get(name)
+        if entry and entry.get('file'):
+            return entry['file']
+        return name
+
+    def entry(self, name):
+        return self.sessions.get(self.key(name), {})
+
+    def new_file(self, name):
+        os.makedirs(self.session_dir, exist_ok=True)
+        return os.path.join(self.session_dir, f"{name}.json")
+
+    def register(self, name, path):
+        """Record a freshly saved session; it has just logged in, so it starts healthy"""
+        now = time.time()
+        return self._update(name, file=path, saved_at=now, health='healthy', reason="just logged in",
+                            validated_at=now, file_mtime=os.path.getmtime(path), failures=0)
+
+    def validate(self, name, force=False):
+        """Health of a session, re-checked at most every validation_ttl seconds unless force"""
+        path = self.file_for(name)
+        key = self.key(name)
+        entry = self.sessions.get(key, {})
+        if not os.path.exists(path):
+            return self._update(key, file=path, health='expired', reason="file not found", validated_at=time.time())['health']
+        # The cache is only valid for the file as it was when checked
+        fresh = (entry.get('validated_at') and time.time() - entry['validated_at'] < self.validation_ttl
+                 and entry.get('file_mtime') == os.path.getmtime(path))
+        if fresh and not force:
+            return entry['health']
+        health, reason = check_state_file(path)
+        print(f"Session {key}: {health} ({reason})")
+        self._update(key, file=path, health=health, reason=reason, validated_at=time.time(),
+                     file_mtime=os.path.getmtime(path))
+        return health
+
+    def mark_used(self, name):
+        self._update(self.key(name), file=self.file_for(name), last_used=time.time())
+
+    def mark_unhealthy(self, name, health, reason):
+        """Called when a run sees the session rejected ('expired') or challenged ('flagged')"""
+        path = self.file_for(name)
+        failures = self.entry(name).get('failures', 0) + 1
+        # Keeps the verdict cached for validation_ttl, so the next run does not pick it straight away
+        self._update(self.key(name), file=path, health=health, reason=reason, validated_at=time.time(),
+                     file_mtime=os.path.getmtime(path) if os.path.exists(path) else None, failures=failures)
+
+    def usable(self, names=None):
+        """Names (or paths) worth running with, healthiest and least recently used first"""
+        names = list(names) if names else list(self.sessions)
+        usable = []
+        for name in names:
+            health = self.validate(name)
+            if health in ('healthy', 'unknown'):
+                usable.append(name)
+        rank = {health: i for i, health in enumerate(HEALTH_STATES)}
+
+        def order(name):
+            entry = self.entry(name)
+            return rank.get(entry.get('health'), len(rank)), entry.get('last_used') or 0
+        return sorted(usable, key=order)
+
+    def report(self):
+        print("\n=== SESSIONS ===")
+        for name, entry in sorted(self.sessions.items()):
+            last_used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used'])) if entry.get('last_used') else 'never'
+            print(f"  {name}: {entry.get('health')} ({entry.get('reason', '')}), file {entry.get('file')}, last used {last_used}")
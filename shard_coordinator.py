@@ -0,0 +1,218 @@
+"""Shard a hashtag list across worker processes, one logged-in session each.
+
+Every worker owns a session file and runs a single engine in its own Chromium
+for the whole run; the engine asks the coordinator for the next hashtag whenever
+one of its grid pages is free and sends accepted rows back over a
+multiprocessing queue.
+The coordinator keeps one shard per worker; a worker whose shard runs dry steals
+from the tail of the longest remaining shard. Rows are merged into the main
+result store (deduplicated on hashtag + username) and exported to CSV once.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue as queue_module
+from collections import deque
+from dataclasses import replace
+
+from instagram_engine import scrape_instagram
+from result_store import ResultStore
+
+
+def split_shards(hashtags, count):
+    """Round-robin hashtags into count shards so every worker starts with a similar mix"""
+    return [deque(hashtags[i::count]) for i in range(count)]
+
+
+def worker_config(config, worker_id, session_file, shard_dir):
+    """Per-worker copy of config: its own session, store, checkpoint, metrics and selector stats files, no CSV export"""
+    prefix = os.path.join(shard_dir, f"worker_{worker_id}")
+    return replace(
+        config,
+        hashtags=[],
+        state_file=session_file,
+        result_store_file=f"{prefix}.db",
+        checkpoint_file=f"{prefix}_checkpoint.json",
+        metrics_json_file=f"{prefix}_metrics.json",
+        metrics_prometheus_file=f"{prefix}_metrics.prom",
+        selector_stats_file=f"{prefix}_selector_stats.json",
+        export_csv=False,
+    )
+
+
+async def _work(worker_id, config, inbox, outbox):
+    def next_hashtag():
+        # Runs in the engine's executor, so waiting on the coordinator does not block the pages
+        outbox.put(('next', worker_id, None))
+        return inbox.get()
+
+    def hashtag_done(tag, finished, added, filtered):
+        outbox.put(('tag_done', worker_id, {'tag': tag, 'finished': finished, 'added': added, 'filtered': filtered}))
+
+    summary = {}
+    # One browser, session check and set of caches for the worker's whole share of the hashtags
+    worker = replace(config, hashtags=[], next_hashtag=next_hashtag, hashtag_done=hashtag_done)
+    async for row in scrape_instagram(worker, on_done=summary.update):
+        outbox.put(('row', worker_id, row))
+    if summary.get('budget_exhausted'):
+        print(f"[worker {worker_id}] Session budget used up")
+
+
+def _worker_main(worker_id, config, inbox, outbox):
+    """Process entry point; module level so it can be pickled by the spawn start method"""
+    try:
+        asyncio.run(_work(worker_id, config, inbox, outbox))
+    except Exception as e:
+        outbox.put(('error', worker_id, str(e)))
+    finally:
+        outbox.put(('exit', worker_id, None))
+
+
+class ShardCoordinator:
+    """Runs one process per session file and merges their results.
+
+    on_status(text) and on_row(row) are optional callbacks run in the coordinator
+    process; on_row only sees rows that were new to the merged store.
+    """
+
+    def __init__(self, config, session_files, shard_dir="shards", on_status=None, on_row=None, max_tag_attempts=2):
+        if not session_files:
+            raise ValueError("At least one session file is needed")
+        self.config = config
+        self.session_files = list(session_files)
+        self.shard_dir = shard_dir
+        self.on_status = on_status
+        self.on_row = on_row
+        self.shards = split_shards(list(config.hashtags), len(self.session_files))
+        self.max_tag_attempts = max_tag_attempts
+        self.tag_attempts = {}
+        self.in_flight = {}
+        self.retired = set()
+        self.unfinished = []
+        self.stolen = 0
+
+    def _status(self, text):
+        print(text)
+        if self.on_status:
+            self.on_status(text)
+
+    def next_tag(self, worker_id):
+        """Next hashtag for worker_id: its own shard first, then the tail of the longest other shard"""
+        own = self.shards[worker_id]
+        if own:
+            return own.popleft()
+        victim = max(range(len(self.shards)), key=lambda i: len(self.shards[i]))
+        if not self.shards[victim]:
+            return None
+        self.stolen += 1
+        tag = self.shards[victim].pop()
+        print(f"[worker {worker_id}] Stole #{tag} from worker {victim}")
+        return tag
+
+    def _requeue(self, tag):
+        """Put an unfinished tag back on the shortest shard so a live worker picks it up"""
+        live = [i for i in range(len(self.shards)) if i not in self.retired]
+        if not live or self.tag_attempts.get(tag, 0) >= self.max_tag_attempts:
+            self.unfinished.append(tag)
+            return
+        target = min(live, key=lambda i: len(self.shards[i]))
+        self.shards[target].appendleft(tag)
+
+    def run(self):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        store = ResultStore(self.config.result_store_file, commit_every=self.config.commit_every_rows)
+        store.import_existing(self.config.output_file)
+        ctx = multiprocessing.get_context('spawn')
+        outbox = ctx.Queue()
+        inboxes = [ctx.Queue() for _ in self.session_files]
+        processes = []
+        for worker_id, session_file in enumerate(self.session_files):
+            config = worker_config(self.config, worker_id, session_file, self.shard_dir)
+            process = ctx.Process(target=_worker_main, args=(worker_id, config, inboxes[worker_id], outbox),
+                                  name=f"shard-worker-{worker_id}")
+            process.start()
+            processes.append(process)
+        self._status(f"Started {len(processes)} workers for {len(self.config.hashtags)} hashtags")
+
+        added = 0
+        duplicates = 0
+        filtered = 0
+        errors = []
+        while len(self.retired) < len(processes):
+            try:
+                kind, worker_id, payload = outbox.get(timeout=5)
+            except queue_module.Empty:
+                # A worker killed from outside never sends 'exit'
+                for worker_id, process in enumerate(processes):
+                    if worker_id not in self.retired and not process.is_alive():
+                        errors.append(f"worker {worker_id} died with exit code {process.exitcode}")
+                        self._retire(worker_id)
+                continue
+            if kind == 'next':
+                tag = self.next_tag(worker_id)
+                if tag:
+                    self.in_flight.setdefault(worker_id, set()).add(tag)
+                    self.tag_attempts[tag] = self.tag_attempts.get(tag, 0) + 1
+                inboxes[worker_id].put(tag)
+            elif kind == 'row':
+                if store.add(payload):
+                    added += 1
+                    if self.on_row:
+                        self.on_row(payload)
+                else:
+                    duplicates += 1
+            elif kind == 'tag_done':
+                self.in_flight.get(worker_id, set()).discard(payload['tag'])
+                filtered += payload['filtered']
+                if payload['finished']:
+                    self._status(f"[worker {worker_id}] #{payload['tag']} done: {payload['added']} added, {payload['filtered']} filtered")
+                else:
+                    self._status(f"[worker {worker_id}] #{payload['tag']} not finished")
+                    self._requeue(payload['tag'])
+            elif kind == 'error':
+                errors.append(f"worker {worker_id}: {payload}")
+                self._status(f"❌ Worker {worker_id} failed: {payload}")
+            elif kind == 'exit':
+                self._retire(worker_id)
+
+        for process in processes:
+            process.join()
+        # Whatever no live worker could take is reported rather than silently dropped
+        for shard in self.shards:
+            self.unfinished.extend(shard)
+            shard.clear()
+
+        store.commit()
+        exported_path = store.export_csv(self.config.output_file)
+        summary = {
+            'added': added,
+            'duplicates': duplicates,
+            'filtered': filtered,
+            'stolen': self.stolen,
+            'unfinished_tags': self.unfinished,
+            'errors': errors,
+            'output_file': self.config.output_file,
+            'result_store_file': self.config.result_store_file,
+            'exported_path': exported_path,
+            'total_in_file': store.count(),
+        }
+        store.close()
+        self._status(f"✅ Done. {added} profiles added ({duplicates} duplicates merged), {filtered} filtered out.")
+        if self.unfinished:
+            self._status(f"⚠️ Not finished: {', '.join('#' + tag for tag in self.unfinished)}")
+        return summary
+
+    def _retire(self, worker_id):
+        self.retired.add(worker_id)
+        # A worker reads several hashtags at once; all of them go back
+        for tag in sorted(self.in_flight.pop(worker_id, set())):
+            self._requeue(tag)
+        # The retired worker's shard is left for the others to steal
+        leftover = self.shards[worker_id]
+        while leftover:
+            self._requeue(leftover.pop())
+
+
+def run_sharded(config, session_files, shard_dir="shards", on_status=None, on_row=None):
+    """Blocking helper: scrape config.hashtags across session_files and return the merged summary"""
+    return ShardCoordinator(config, session_files, shard_dir, on_status, on_row).run()
@@ -0,0 +1,204 @@
+import math
+import random
+from collections import deque
+
+from circuit_breaker import NavigationBlocked
+from scraper_pool import BudgetExhausted
+
+
+def yield_upper_bound(accepted, posts, z=1.64):
+    """Wilson score upper bound of the acceptance rate (about 95% one-sided)"""
+    if posts == 0:
+        return 1.0
+    p = accepted / posts
+    denominator = 1 + z * z / posts
+    centre = p + z * z / (2 * posts)
+    spread = z * math.sqrt(p * (1 - p) / posts + z * z / (4 * posts * posts))
+    return min(1.0, (centre + spread) / denominator)
+
+
+class TagState:
+    """One hashtag's progress in the run, restored from the checkpoint.
+
+    status is pending, active (its grid is open), finished (quota, attempt cap or
+    grid exhausted), cut (yield too low to be worth more posts) or failed.
+    """
+
+    def __init__(self, tag, progress):
+        self.tag = tag
+        self.tried_posts = progress['tried_posts']
+        self.profiles_found = progress['profiles_found']
+        self.filtered = progress['filtered']
+        self.attempts = progress['attempts']
+        self.status = 'finished' if progress['done'] else 'pending'
+        # This run only
+        self.posts = 0
+        self.seconds = 0.0
+        self.feed = None
+        self.page = None
+        self.links = None
+
+    @property
+    def done(self):
+        return self.status in ('finished', 'cut')
+
+    def record(self, seconds):
+        self.posts += 1
+        self.seconds += seconds
+
+    def acceptance_rate(self):
+        return self.profiles_found / self.attempts if self.attempts else 0.0
+
+    def seconds_per_accepted(self):
+        accepted = self.profiles_found
+        return round(self.seconds / accepted, 1) if accepted and self.posts else None
+
+
+class YieldScheduler:
+    """Interleaves hashtags and hands the next post to the one with the best expected yield.
+
+    Up to open_tags grids are open at once. Each pull draws an acceptance rate per
+    open tag from its Beta posterior (Thompson sampling) and divides it by the tag's
+    seconds per post, so time goes where accepted profiles are cheapest while
+    uncertain tags still get tried. After min_posts attempts a tag is cut, and its
+    grid goes to the next tag, once its rate upper bound at cut_z (about 97.5%
+    one-sided) is under min_yield. With the defaults that is after about 190
+    posts when none passed and 280 when one did: slow to give up on a dead tag,
+    but a tag that really yields 5% or more is almost never cut by bad luck.
+    With adaptive=False tags run one after another in order, as they used to.
+    more, an async callable returning a further TagState (None when there are
+    no more), is asked whenever a grid page is free and no tag is pending; shard
+    workers get their hashtags from the coordinator this way.
+    """
+
+    def __init__(self, states, quota, max_attempts=1000, open_tags=3, min_posts=20, min_yield=0.02,
+                 adaptive=True, rng=None, cut_z=1.96, more=None):
+        self.states = states
+        self.quota = quota
+        self.max_attempts = max_attempts
+        self.open_tags = open_tags if adaptive else 1
+        self.min_posts = min_posts
+        self.min_yield = min_yield
+        self.cut_z = cut_z
+        self.more = more
+        self.adaptive = adaptive
+        self.rng = rng or random.Random()
+        self.free_pages = []
+
+    def _done_reason(self, state):
+        if state.profiles_found >= self.quota or state.attempts >= self.max_attempts:
+            return 'finished'
+        if (self.adaptive and state.attempts >= self.min_posts
+                and yield_upper_bound(state.profiles_found, state.attempts, z=self.cut_z) < self.min_yield):
+            return 'cut'
+        return None
+
+    def _mean_seconds(self):
+        posts = sum(s.posts for s in self.states)
+        return sum(s.seconds for s in self.states) / posts if posts else 1.0
+
+    def _score(self, state):
+        rate = self.rng.betavariate(state.profiles_found + 1, max(0, state.attempts - state.profiles_found) + 1)
+        seconds = state.seconds / state.posts if state.posts else self._mean_seconds()
+        return rate / max(seconds, 0.1)
+
+    async def _close(self, state, status, on_close):
+        state.status = status
+        if state.links is not None:
+            await state.links.aclose()
+            state.links = None
+        on_close(state)
+
+    async def links(self, grid_pages, make_feed, on_close):
+        """Yield (state, post_link) pairs across all tags.
+
+        make_feed(state, page) builds a HashtagFeed for a tag on a free grid page;
+        on_close(state) runs when a tag leaves the rotation as finished, cut or
+        failed. Tags still active when the consumer stops are left 'active'.
+        """
+        pending = deque(s for s in self.states if s.status == 'pending')
+        free_pages = self.free_pages = list(grid_pages[:self.open_tags])
+        window = []
+        try:
+            while True:
+                for state in list(window):
+                    reason = self._done_reason(state)
+                    if reason:
+                        window.remove(state)
+                        free_pages.append(state.page)
+                        await self._close(state, reason, on_close)
+                while free_pages and (pending or self.more):
+                    if not pending:
+                        state = await self.more()
+                        if state is None:
+                            self.more = None
+                            continue
+                        self.states.append(state)
+                        pending.append(state)
+                    state = pending.popleft()
+                    reason = self._done_reason(state)
+                    if reason:
+                        await self._close(state, reason, on_close)
+                        continue
+                    page = free_pages.pop()
+                    feed = make_feed(state, page)
+                    try:
+                        await feed.open()
+                    except (BudgetExhausted, NavigationBlocked):
+                        # The session or the run is done, not this tag
+                        free_pages.append(page)
+                        raise
+                    except Exception as e:
+                        print(f"❌ Failed to open #{state.tag}: {e}")
+                        free_pages.append(page)
+                        await self._close(state, 'failed', on_close)
+                        continue
+                    state.feed, state.page, state.links = feed, page, feed.links()
+                    state.status = 'active'
+                    window.append(state)
+                if not window:
+                    return
+                state = max(window, key=self._score) if self.adaptive else window[0]
+                try:
+                    link = await state.links.__anext__()
+                except (BudgetExhausted, NavigationBlocked):
+                    raise
+                except StopAsyncIteration:
+                    state.links = None
+                    window.remove(state)
+                    free_pages.append(state.page)
+                    await self._close(state, 'finished', on_close)
+                    continue
+                except Exception as e:
+                    print(f"❌ Failed to read #{state.tag}: {e}")
+                    window.remove(state)
+                    free_pages.append(state.page)
+                    await self._close(state, 'failed', on_close)
+                    continue
+                yield state, link
+        finally:
+            for state in window:
+                if state.links is not None:
+                    await state.links.aclose()
+                    state.links = None
+
+    def replace_page(self, old, new):
+        """A grid page was recycled: the tag reading it (or the free slot) moves to new"""
+        self.free_pages[:] = [new if page is old else page for page in self.free_pages]
+        for state in self.states:
+            if state.page is old:
+                state.page = new
+                if state.feed:
+                    state.feed.move_to(new)
+
+    def summary(self):
+        return {s.tag: {'status': s.status, 'attempts': s.attempts, 'accepted': s.profiles_found,
+                        'acceptance_rate': round(s.acceptance_rate(), 3),
+                        'seconds_per_accepted': s.seconds_per_accepted()} for s in self.states}
+
+    def report(self):
+        print("\n=== HASHTAG YIELD ===")
+        for tag, row in self.summary().items():
+            cost = f", {row['seconds_per_accepted']}s per accepted profile" if row['seconds_per_accepted'] else ""
+            print(f"  #{tag}: {row['status']}, {row['accepted']}/{row['attempts']} accepted "
+                  f"({row['acceptance_rate'] * 100:.1f}%){cost}")
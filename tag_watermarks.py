@@ -0,0 +1,52 @@
+import json
+import os
+import time
+
+from file_lock import locked, tmp_path
+
+
+class TagWatermarks:
+    """Per-hashtag high-watermark: the newest post shortcodes already processed, newest first.
+
+    A refresh run scrolls a hashtag only until it runs into a stretch of these
+    posts, so it pays for new content only. Kept across runs, unlike the checkpoint.
+    """
+
+    def __init__(self, path="tag_watermarks.json", keep=100):
+        self.path = path
+        self.keep = keep
+        self.tags = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading tag watermarks: {e}")
+            return {}
+
+    def known(self, tag):
+        """Shortcodes at or below the watermark of tag"""
+        return set(self.tags.get(tag, {}).get('shortcodes', []))
+
+    def update(self, tag, shortcodes):
+        """Raise the watermark with the posts handled this run, in grid order (newest first)"""
+        if not shortcodes:
+            return
+        # Shard workers share the file, each owning different tags
+        with locked(self.path):
+            self.tags = self._load()
+            merged = list(dict.fromkeys(list(shortcodes) + self.tags.get(tag, {}).get('shortcodes', [])))
+            self.tags[tag] = {'shortcodes': merged[:self.keep], 'updated_at': time.time()}
+            self._save()
+
+    def _save(self):
+        tmp = tmp_path(self.path)
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.tags, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Error saving tag watermarks: {e}")